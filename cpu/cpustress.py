@@ -18,13 +18,22 @@
 Stress test for CPU
 """
 
+import os
+import sys
+import json
+import math
+import time
 import multiprocessing
 from random import randint
 from avocado import Test
 from avocado import main
-from avocado.utils import process, cpu, distro
+from avocado.utils import process, cpu, distro, astring
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.kmsg import KmsgMonitor  # noqa
+
 
 pids = []
 totalcpus = int(multiprocessing.cpu_count()) - 1
@@ -36,8 +45,132 @@ errorlog = ['WARNING: CPU:', 'Oops',
             'Call Trace:']
 
 
-def collect_dmesg(object):
-    object.whiteboard = process.system_output("dmesg").decode('utf-8')
+def parse_cpu_list(cpu_list):
+    """
+    Returns the cpus of a kernel cpu list like 0-3,8
+    """
+    cpus = []
+    for item in cpu_list.strip().split(','):
+        if '-' in item:
+            first, last = item.split('-')
+            cpus.extend(range(int(first), int(last) + 1))
+        elif item:
+            cpus.append(int(item))
+    return cpus
+
+
+class CpuHotplug(object):
+
+    """
+    Hotplugs cpus by writing their sysfs online files through file
+    descriptors opened once, and records the latency of every transition.
+    The topology is read up front, as it goes away with offline cpus.
+    """
+
+    def __init__(self, cpus, log):
+        self.log = log
+        self.fds = {}
+        self.core = {}
+        self.sibling = {}
+        self.transitions = []
+        for cpu_id in cpus:
+            path = '/sys/devices/system/cpu/cpu%s' % cpu_id
+            try:
+                self.fds[cpu_id] = os.open(os.path.join(path, 'online'),
+                                           os.O_RDWR)
+            except OSError:
+                # not hotpluggable
+                continue
+            try:
+                with open(os.path.join(path, 'topology/core_id')) as c_file:
+                    self.core[cpu_id] = int(c_file.read())
+                with open(os.path.join(
+                        path, 'topology/thread_siblings_list')) as s_file:
+                    siblings = parse_cpu_list(s_file.read())
+                self.sibling[cpu_id] = siblings.index(cpu_id)
+            except (IOError, OSError, ValueError):
+                self.core[cpu_id] = self.sibling[cpu_id] = None
+
+    def is_online(self, cpu_id):
+        """
+        Returns whether cpu_id is online, cpus that can not be hotplugged
+        always are.
+        """
+        if cpu_id not in self.fds:
+            return True
+        return os.pread(self.fds[cpu_id], 1, 0) == b'1'
+
+    def set_state(self, cpu_id, online):
+        """
+        Onlines or offlines cpu_id and records how long it took.
+
+        :return: True if the cpu is in the requested state
+        """
+        if cpu_id not in self.fds:
+            return online
+        if self.is_online(cpu_id) == online:
+            return True
+        stamp = time.time()
+        # the wall clock can jump, the latency is taken on a monotonic one
+        start = time.perf_counter()
+        try:
+            os.pwrite(self.fds[cpu_id], b'1' if online else b'0', 0)
+        except OSError as details:
+            self.log.debug("cpu%s %s failed: %s", cpu_id,
+                           'online' if online else 'offline', details)
+            return False
+        self.transitions.append((stamp, cpu_id, int(online),
+                                 time.perf_counter() - start))
+        return True
+
+    def online(self, cpu_id):
+        return self.set_state(cpu_id, True)
+
+    def offline(self, cpu_id):
+        return self.set_state(cpu_id, False)
+
+    def toggle(self, cpu_id):
+        return self.set_state(cpu_id, not self.is_online(cpu_id))
+
+    def latency_report(self):
+        """
+        Returns the online and offline latency statistics (in usec) and
+        their log2 histograms, overall and per cpu, core and SMT sibling.
+        """
+        groups = {}
+        for _, cpu_id, online, latency in self.transitions:
+            direction = 'online' if online else 'offline'
+            for group, key in [('all', 'all'), ('cpu', cpu_id),
+                               ('core', self.core.get(cpu_id)),
+                               ('sibling', self.sibling.get(cpu_id))]:
+                groups.setdefault(group, {}).setdefault(
+                    str(key), {}).setdefault(direction, []).append(
+                        latency * 1000000)
+        report = {}
+        for group, keys in groups.items():
+            report[group] = {}
+            for key, directions in keys.items():
+                report[group][key] = {}
+                for direction, latencies in directions.items():
+                    latencies.sort()
+                    count = len(latencies)
+                    histogram = {}
+                    for latency in latencies:
+                        bucket = str(2 ** int(math.ceil(math.log(
+                            max(latency, 1), 2))))
+                        histogram[bucket] = histogram.get(bucket, 0) + 1
+                    report[group][key][direction] = {
+                        'count': count, 'min': latencies[0],
+                        'median': latencies[(count - 1) // 2],
+                        'p99': latencies[min(count - 1,
+                                             int(count * 0.99))],
+                        'max': latencies[-1], 'histogram': histogram}
+        return report
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds = {}
 
 
 class cpustresstest(Test):
@@ -63,6 +196,8 @@ class cpustresstest(Test):
         """
         Check required packages is installed, and get current SMT value.
         """
+        self.kmsg = None
+        self.hotplug = None
         if 'ppc' not in distro.detect().arch:
             self.cancel("Processor is not powerpc")
         sm = SoftwareManager()
@@ -74,21 +209,8 @@ class cpustresstest(Test):
                 self.cancel("%s is required to continue..." % pkg)
         self.iteration = int(self.params.get('iteration', default='10'))
         self.tests = self.params.get('test', default='all')
-
-    @staticmethod
-    def __clear_dmesg():
-        process.run("dmesg -C", sudo=True)
-
-    @staticmethod
-    def __error_check():
-        ERROR = []
-        logs = process.system_output("dmesg -Txl 1,2,3,4"
-                                     "").decode("utf-8").splitlines()
-        for error in errorlog:
-            for log in logs:
-                if error in log:
-                    ERROR.append(log)
-        return "\n".join(ERROR)
+        self.kmsg = KmsgMonitor(errorlog, max_level=4)
+        self.kmsg.start()
 
     @staticmethod
     def __isSMT():
@@ -97,22 +219,33 @@ class cpustresstest(Test):
             return False
         return True
 
-    @staticmethod
-    def __online_cpus(cores):
+    def __online_cpus(self, cores):
         for cpus in range(cores):
-            cpu.online(cpus)
+            if self.hotplug:
+                self.hotplug.online(cpus)
+            else:
+                cpu.online(cpus)
 
-    @staticmethod
-    def __offline_cpus(cores):
+    def __offline_cpus(self, cores):
         for cpus in range(cores):
-            cpu.offline(cpus)
+            self.hotplug.offline(cpus)
 
-    @staticmethod
-    def __cpu_toggle(core):
-        if cpu._get_cpu_status(core):
-            cpu.offline(core)
-        else:
-            cpu.online(core)
+    def __cpu_toggle(self, core):
+        self.hotplug.toggle(core)
+
+    def __set_affinity(self, pid, cpus):
+        try:
+            os.sched_setaffinity(pid, cpus)
+        except OSError as details:
+            self.log.debug("Affinity of %s to %s not set: %s", pid, cpus,
+                           details)
+
+    def __log_affinity(self, pid):
+        try:
+            self.log.info("pid %s affinity: %s", pid,
+                          sorted(os.sched_getaffinity(pid)))
+        except OSError as details:
+            self.log.info("pid %s affinity: %s", pid, details)
 
     @staticmethod
     def __kill_process(pids):
@@ -124,6 +257,7 @@ class cpustresstest(Test):
         calls each of the test in a loop for the given values
         """
         self.__online_cpus(totalcpus)
+        self.hotplug = CpuHotplug(range(totalcpus + 1), self.log)
         if 'all' in self.tests:
             tests = ['cpu_serial_off_on',
                      'single_cpu_toggle',
@@ -136,14 +270,55 @@ class cpustresstest(Test):
 
         for method in tests:
             self.log.info("\nTEST: %s\n", method)
-            self.__clear_dmesg()
             run_test = 'self.%s()' % method
             eval(run_test)
-            msg = self.__error_check()
+            msg = "\n".join(self.kmsg.new_errors())
             if msg:
-                collect_dmesg()
+                self.whiteboard = "\n".join(self.kmsg.records)
                 self.log.info('Test: %s. ERROR Message: %s', run_test, msg)
             self.log.info("\nEND: %s\n", method)
+        self.report_latency()
+
+    def report_latency(self):
+        """
+        Logs the hotplug latencies, saves their histograms and compares
+        them to the ones of a previous run (latency_baseline parameter).
+        """
+        report = self.hotplug.latency_report()
+        if not report:
+            return
+        with open(os.path.join(self.outputdir,
+                               'hotplug_latency.json'), 'w') as l_file:
+            json.dump(report, l_file, indent=1)
+        matrix = []
+        for group in ['all', 'core', 'sibling']:
+            for key in sorted(report.get(group, {})):
+                for direction, stats in sorted(report[group][key].items()):
+                    matrix.append([group, key, direction, stats['count'],
+                                   "%.0f" % stats['min'],
+                                   "%.0f" % stats['median'],
+                                   "%.0f" % stats['p99'],
+                                   "%.0f" % stats['max']])
+        header = ['Group', 'Key', 'Transition', 'Count', 'Min (us)',
+                  'Median (us)', 'P99 (us)', 'Max (us)']
+        self.log.info("\n%s", astring.tabular_output(matrix, header))
+        baseline_file = self.params.get('latency_baseline', default=None)
+        if not baseline_file:
+            return
+        threshold = float(self.params.get('latency_threshold', default=20))
+        with open(baseline_file) as b_file:
+            baseline = json.load(b_file)
+        for key, directions in report['all'].items():
+            for direction, stats in directions.items():
+                base = baseline.get('all', {}).get(key, {}).get(direction)
+                if not base or not base['median']:
+                    continue
+                change = ((stats['median'] - base['median']) * 100.0 /
+                          base['median'])
+                if change > threshold:
+                    self.log.warning("REGRESSION: median %s latency %.0fus "
+                                     "was %.0fus (%+.2f%%)", direction,
+                                     stats['median'], base['median'], change)
 
     def cpu_serial_off_on(self):
         """
@@ -157,21 +332,21 @@ class cpustresstest(Test):
             self.log.info("OFF-ON Serial Test %s", totalcpus)
             if (totalcpus != 0):
                 for cpus in range(1, totalcpus):
-                    self.log.info("cpu%s going offline" % cpus)
-                    cpu.offline(cpus)
+                    self.log.debug("cpu%s going offline", cpus)
+                    self.hotplug.offline(cpus)
             self.log.info("Online CPU's in reverse order %s", totalcpus)
             for cpus in range(totalcpus, -1, -1):
-                self.log.info("cpu%s going online" % cpus)
-                cpu.online(cpus)
+                self.log.debug("cpu%s going online", cpus)
+                self.hotplug.online(cpus)
             self.log.info("Offline CPU's in reverse order %s", totalcpus)
             if (totalcpus != 0):
                 for cpus in range(totalcpus, -1, -2):
-                    self.log.info("cpu%s going offline" % cpus)
-                    cpu.offline(cpus)
+                    self.log.debug("cpu%s going offline", cpus)
+                    self.hotplug.offline(cpus)
             self.log.info("Online CPU's in serial")
             for cpus in range(0, totalcpus):
-                self.log.info("cpu%s going online" % cpus)
-                cpu.online(cpus)
+                self.log.debug("cpu%s going online", cpus)
+                self.hotplug.online(cpus)
 
     def single_cpu_toggle(self):
         """
@@ -182,10 +357,10 @@ class cpustresstest(Test):
         for cpus in range(1, totalcpus):
             for _ in range(self.iteration):
                 if (totalcpus != 0):
-                    self.log.info("cpu%s going offline" % cpus)
-                    cpu.offline(cpus)
-                self.log.info("cpu%s going online" % cpus)
-                cpu.online(cpus)
+                    self.log.debug("cpu%s going offline", cpus)
+                    self.hotplug.offline(cpus)
+                self.log.debug("cpu%s going online", cpus)
+                self.hotplug.online(cpus)
 
     def cpu_toggle_one_by_one(self):
         """
@@ -195,10 +370,10 @@ class cpustresstest(Test):
         for _ in range(self.iteration):
             for cpus in range(totalcpus):
                 if (totalcpus != 0):
-                    self.log.info("cpu%s going offline" % cpus)
-                    cpu.offline(cpus)
-                self.log.info("cpu%s going online" % cpus)
-                cpu.online(cpus)
+                    self.log.debug("cpu%s going offline", cpus)
+                    self.hotplug.offline(cpus)
+                self.log.debug("cpu%s going online", cpus)
+                self.hotplug.online(cpus)
 
     def multiple_cpus_toggle(self):
         """
@@ -225,23 +400,25 @@ class cpustresstest(Test):
             pid = process.SubProcess(
                 "while :; do :; done", shell=True).start()
             pids.append(pid)
-            process.run("taskset -pc %s %s" %
-                        (proc, pid), ignore_status=True, shell=True)
+            self.__set_affinity(pid, [proc])
 
         self.log.info("\noffline cpus and see the affinity change")
         count = 0
         for pid in pids:
-            cpu.offline(count)
-            process.run("taskset -pc %s" % pid, ignore_status=True, shell=True)
+            self.hotplug.offline(count)
+            self.__log_affinity(pid)
             count = count + 1
 
         self.__online_cpus(totalcpus)
 
         self.log.info("\nShift affinity for the same process and toggle")
+        # a child of its own is shifted around, never the test process
+        shifted = process.SubProcess("while :; do :; done", shell=True)
+        shifted_pid = shifted.start()
+        pids.append(shifted_pid)
         for proc in range(totalcpus):
-            process.run("taskset -pc $((%s<<1)) $$" %
-                        proc, ignore_status=True, shell=True)
-            cpu.offline(proc)
+            self.__set_affinity(shifted_pid, [proc << 1])
+            self.hotplug.offline(proc)
 
         self.__online_cpus(totalcpus)
 
@@ -250,18 +427,16 @@ class cpustresstest(Test):
             "numactl --hardware | grep cpus:",  shell=True)
         nodes = nodes.decode().split('\n')
         for node in nodes:
-            cores = node.split(': ')[-1].replace(" ", ",")
-            if cores:
+            cores = node.split(': ')[-1].split()
+            if cores and node:
                 for pid in pids:
-                    process.run("taskset -pc %s %s" %
-                                (cores, pid), ignore_status=True, shell=True)
+                    self.__set_affinity(pid, [int(core) for core in cores])
 
         self.log.info(
             "\ntoggle random cpu, while shifting affinity of same pid")
         for i in range(self.iteration):
             core = randint(0, totalcpus)
-            process.run("taskset -pc $((%s<<1)) $$" %
-                        core, ignore_status=True, shell=True)
+            self.__set_affinity(shifted_pid, [core << 1])
             self.__cpu_toggle(core)
 
         self.__kill_process(pids)
@@ -303,6 +478,10 @@ class cpustresstest(Test):
             "ppc64_cpu --smt=off && ppc64_cpu --smt=on && ppc64_cpu --smt=%s"
             % self.curr_smt, shell=True)
         self.__online_cpus(totalcpus)
+        if self.hotplug:
+            self.hotplug.close()
+        if self.kmsg:
+            self.kmsg.stop()
 
 
 if __name__ == "__main__":
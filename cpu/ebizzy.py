@@ -19,6 +19,7 @@
 #   https://github.com/autotest/autotest-client-tests/tree/master/ebizzy
 
 import os
+import sys
 import json
 import re
 
@@ -29,6 +30,11 @@ from avocado.utils import process
 from avocado.utils import build
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.metrics import metric, emit_metrics  # noqa
+from testlib.repetition import RepetitionController  # noqa
+
 
 class Ebizzy(Test):
 
@@ -78,20 +84,42 @@ class Ebizzy(Test):
                                                       seconds, num_threads)
         args = args + ' ' + args2
 
-        results = process.system_output('%s/ebizzy %s'
-                                        % (self.sourcedir, args)).decode("utf-8")
-        pattern = re.compile(r"(.*?) records/s")
-        records = pattern.findall(results)[0]
-        pattern = re.compile(r"real (.*?) s")
-        real = pattern.findall(results)[0]
-        pattern = re.compile(r"user (.*?) s")
-        usr_time = pattern.findall(results)[0]
-        pattern = re.compile(r"sys (.*?) s")
-        sys_time = pattern.findall(results)[0]
-        self.whiteboard = json.dumps({'records': records,
-                                      'real_time': real,
-                                      'user': usr_time,
-                                      'sys': sys_time})
+        runs = []
+
+        def measure():
+            results = process.system_output('%s/ebizzy %s'
+                                            % (self.sourcedir,
+                                               args)).decode("utf-8")
+            run = {}
+            for key, regex in [('records', r"(.*?) records/s"),
+                               ('real_time', r"real (.*?) s"),
+                               ('user', r"user (.*?) s"),
+                               ('sys', r"sys (.*?) s")]:
+                run[key] = float(re.findall(regex, results)[0])
+            runs.append(run)
+            return run['records']
+
+        repeater = RepetitionController(
+            self.log, warmup=self.params.get('warmup_runs', default=0),
+            min_runs=self.params.get('min_runs', default=1),
+            max_runs=self.params.get('max_runs', default=1),
+            ci_target=self.params.get('ci_target', default=5),
+            time_budget=self.params.get('time_budget', default=None))
+        stats = repeater.run(measure)
+        runs = runs[repeater.warmup:]
+        with open(os.path.join(self.outputdir,
+                               'repetitions.json'), 'w') as rep_file:
+            json.dump({'records': stats, 'runs': runs}, rep_file, indent=1)
+
+        def mean(key):
+            return sum(run[key] for run in runs) / len(runs)
+        emit_metrics(self, 'ebizzy', args2,
+                     [metric('records', stats['mean'], 'records/s'),
+                      metric('records_stddev', stats['stddev'], 'records/s',
+                             False),
+                      metric('real_time', mean('real_time'), 's', False),
+                      metric('user', mean('user'), 's', False),
+                      metric('sys', mean('sys'), 's', False)])
 
 
 if __name__ == "__main__":
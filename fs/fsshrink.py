@@ -14,12 +14,21 @@
 #
 
 import os
+import sys
 import shutil
 
 from avocado import Test
 from avocado import main
 from avocado.utils import process
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.kmsg import KmsgMonitor  # noqa
+
+
+DMESG_PATTERNS = ['WARNING: CPU:', 'Oops',
+                  'Segfault', 'soft lockup', 'Unable to handle']
+
 
 class Fsshrink(Test):
     '''
@@ -29,22 +38,19 @@ class Fsshrink(Test):
     :avocado: tags=fs
     '''
 
-    def clear_dmesg(self):
-        process.run("dmesg -C ", sudo=True)
-
     def verify_dmesg(self):
-        self.whiteboard = process.system_output("dmesg").decode()
-        pattern = ['WARNING: CPU:', 'Oops',
-                   'Segfault', 'soft lockup', 'Unable to handle']
-        for fail_pattern in pattern:
-            if fail_pattern in self.whiteboard:
-                self.fail("Test Failed : %s in dmesg" % fail_pattern)
+        errors = self.kmsg.new_errors()
+        self.whiteboard = "\n".join(self.kmsg.records)
+        if errors:
+            self.fail("Test Failed : %s in dmesg" % errors[0])
 
     def setUp(self):
+        self.kmsg = None
         shutil.copy(self.get_data('test-shrink.sh'),
                     self.teststmpdir)
 
-        self.clear_dmesg()
+        self.kmsg = KmsgMonitor(DMESG_PATTERNS)
+        self.kmsg.start()
 
     def test(self):
 
@@ -55,6 +61,10 @@ class Fsshrink(Test):
 
         self.verify_dmesg()
 
+    def tearDown(self):
+        if self.kmsg:
+            self.kmsg.stop()
+
 
 if __name__ == "__main__":
     main()
@@ -20,6 +20,7 @@
 
 
 import os
+import sys
 import re
 from avocado import Test
 from avocado import main
@@ -29,6 +30,12 @@ from avocado.utils.partition import Partition
 
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.build_cache import build_cache_key, restore_build  # noqa
+from testlib.build_cache import store_build  # noqa
+from testlib.packages import install_packages  # noqa
+
 
 def clear_dmesg():
     process.run("dmesg -c ", sudo=True)
@@ -105,22 +112,40 @@ class LTP(Test):
                 process.run('echo 2 > /proc/sys/vm/overcommit_memory',
                             shell=True, ignore_status=True)
 
-        for package in deps:
-            if not smg.check_installed(package) and not smg.install(package):
-                self.cancel('%s is needed for the test to be run' % package)
+        memo_file = os.path.join(self.teststmpdir, 'installed_packages.json')
+        missing = install_packages(smg, deps, memo_file)
+        if missing:
+            self.cancel('%s is needed for the test to be run'
+                        % ", ".join(missing))
         clear_dmesg()
         url = "https://github.com/linux-test-project/ltp/archive/master.zip"
         tarball = self.fetch_asset("ltp-master.zip", locations=[url])
-        archive.extract(tarball, self.workdir)
         ltp_dir = os.path.join(self.workdir, "ltp-master")
+        # LTP is configured for the fixed prefix and installed under
+        # ltp_dir with DESTDIR, so the tree is the same whichever workdir
+        # it is built in and a cached one restores to any other workdir
+        prefix = '/opt/ltp'
+        destdir = os.path.join(ltp_dir, 'install')
+        self.ltpbin_dir = destdir + prefix
+        cache_dir = self.params.get('build_cache_dir', default=os.path.join(
+            self.cache_dirs[0], 'build_cache'))
+        cache_size = self.params.get('build_cache_size', default=4096)
+        key = build_cache_key(tarball, dist.arch, 'autotools',
+                              '--prefix=%s' % prefix,
+                              'install DESTDIR=%s' %
+                              os.path.relpath(destdir, ltp_dir))
+        if (restore_build(cache_dir, key, ltp_dir) and
+                os.path.isfile(os.path.join(self.ltpbin_dir, 'runltp'))):
+            self.log.info("Reusing cached LTP build %s", key)
+            os.chdir(ltp_dir)
+            return
+        archive.extract(tarball, self.workdir)
         os.chdir(ltp_dir)
         build.make(ltp_dir, extra_args='autotools')
-        if not self.ltpbin_dir:
-            self.ltpbin_dir = os.path.join(ltp_dir, 'bin')
-        os.mkdir(self.ltpbin_dir)
-        process.system('./configure --prefix=%s' % self.ltpbin_dir)
+        process.system('./configure --prefix=%s' % prefix)
         build.make(ltp_dir)
-        build.make(ltp_dir, extra_args='install')
+        build.make(ltp_dir, extra_args='install DESTDIR=%s' % destdir)
+        store_build(cache_dir, key, ltp_dir, cache_size * 1024 * 1024)
 
     def test(self):
         logfile = os.path.join(self.logdir, 'ltp.log')
@@ -131,7 +156,6 @@ class LTP(Test):
                          self.get_data('skipfile')))
         if self.mem_leak:
             self.args += " -M %s" % self.mem_leak
-        self.ltpbin_dir = os.path.join(self.workdir, "ltp-master", 'bin')
         cmd = "%s %s" % (os.path.join(self.ltpbin_dir, 'runltp'), self.args)
         process.run(cmd, ignore_status=True)
         # Walk the ltp.log and try detect failed tests from lines like these:
@@ -17,12 +17,19 @@
 #
 
 import os
+import sys
 import multiprocessing
 from avocado import Test
 from avocado import main
 from avocado.utils import process, build, archive, distro, memory
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.build_cache import build_cache_key, restore_build  # noqa
+from testlib.build_cache import store_build  # noqa
+from testlib.packages import install_packages  # noqa
+
 
 def clear_dmesg():
     process.run("dmesg -C ", sudo=True)
@@ -71,24 +78,34 @@ class Stressng(Test):
         else:
             deps.extend(['libattr-devel', 'libcap-devel',
                          'libgcrypt-devel', 'zlib-devel', 'libaio-devel'])
-        for package in deps:
-            if not smm.check_installed(package) and not smm.install(package):
-                self.cancel("%s is needed, get the source and build" %
-                            package)
+        memo_file = os.path.join(self.teststmpdir, 'installed_packages.json')
+        missing = install_packages(smm, deps, memo_file)
+        if missing:
+            self.cancel("%s is needed, get the source and build" %
+                        ", ".join(missing))
 
         tarball = self.fetch_asset('stressng.zip',
                                    locations=['https://github.com/Colin'
                                               'IanKing/stress-ng/archive'
                                               '/master.zip'], expire='7d')
-        archive.extract(tarball, self.workdir)
         sourcedir = os.path.join(self.workdir, 'stress-ng-master')
-        os.chdir(sourcedir)
-        result = build.run_make(sourcedir,
-                                process_kwargs={'ignore_status': True})
-        for line in str(result).splitlines():
-            if 'error:' in line:
-                self.cancel(
-                    "Unsupported OS, Please check the build logs !!")
+        cache_dir = self.params.get('build_cache_dir', default=os.path.join(
+            self.cache_dirs[0], 'build_cache'))
+        cache_size = self.params.get('build_cache_size', default=4096)
+        key = build_cache_key(tarball, detected_distro.arch)
+        if restore_build(cache_dir, key, sourcedir):
+            self.log.info("Reusing cached stress-ng build %s", key)
+            os.chdir(sourcedir)
+        else:
+            archive.extract(tarball, self.workdir)
+            os.chdir(sourcedir)
+            result = build.run_make(sourcedir,
+                                    process_kwargs={'ignore_status': True})
+            for line in str(result).splitlines():
+                if 'error:' in line:
+                    self.cancel(
+                        "Unsupported OS, Please check the build logs !!")
+            store_build(cache_dir, key, sourcedir, cache_size * 1024 * 1024)
         build.make(sourcedir, extra_args='install')
         clear_dmesg()
 
@@ -15,12 +15,21 @@
 # Author: Hariharan T.S.  <harihare@in.ibm.com>
 
 import os
+import sys
 import shutil
 from avocado import Test
 from avocado import main
 from avocado.utils import process, git
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.kmsg import KmsgMonitor  # noqa
+
+
+DMESG_PATTERNS = ['WARNING: CPU:', 'Oops',
+                  'Segfault', 'soft lockup', 'Unable to handle']
+
 
 class Sysbench(Test):
     """
@@ -30,16 +39,11 @@ class Sysbench(Test):
     :avocado: tags=cpu,threads
     """
 
-    def clear_dmesg(self):
-        process.run("dmesg -C ", sudo=True)
-
     def verify_dmesg(self):
-        self.whiteboard = process.system_output("dmesg").decode("utf-8")
-        pattern = ['WARNING: CPU:', 'Oops',
-                   'Segfault', 'soft lockup', 'Unable to handle']
-        for fail_pattern in pattern:
-            if fail_pattern in self.whiteboard:
-                self.fail("Test Failed : %s in dmesg" % fail_pattern)
+        errors = self.kmsg.new_errors()
+        self.whiteboard = "\n".join(self.kmsg.records)
+        if errors:
+            self.fail("Test Failed : %s in dmesg" % errors[0])
 
     def run_cmd(self, cmdline):
         try:
@@ -48,6 +52,7 @@ class Sysbench(Test):
             self.fail("The sysbench failed: %s" % details)
 
     def setUp(self):
+        self.kmsg = None
         if process.system("which sysbench", ignore_status=True):
             softmanager = SoftwareManager()
             if not softmanager.check_installed('sysbench') \
@@ -87,7 +92,8 @@ class Sysbench(Test):
         self.test_type = self.params.get('type', default='cpu')
         self.cpu_max_prime = int(self.params.get('cpu-max-prime', default=100))
         self.threads_locks = self.params.get('threads-locks', default=None)
-        self.clear_dmesg()
+        self.kmsg = KmsgMonitor(DMESG_PATTERNS)
+        self.kmsg.start()
 
     def test(self):
         args = []
@@ -105,6 +111,10 @@ class Sysbench(Test):
         self.run_cmd(cmdline)
         self.verify_dmesg()
 
+    def tearDown(self):
+        if self.kmsg:
+            self.kmsg.stop()
+
 
 if __name__ == "__main__":
     main()
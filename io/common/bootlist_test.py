@@ -16,13 +16,17 @@
 Bootlist Test
 """
 
+import os
+import sys
+
 import netifaces
 from avocado import main
 from avocado import Test
 from avocado.utils import process
-from avocado import skipUnless
 
-IS_POWER_VM = 'pSeries' in open('/proc/cpuinfo', 'r').read()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, os.pardir))
+from testlib.platform_facts import skip_unless, is_power_vm  # noqa
 
 
 class BootlisTest(Test):
@@ -30,8 +34,8 @@ class BootlisTest(Test):
     Displays and alters the list of boot devices available
     to the system
     '''
-    @skipUnless(IS_POWER_VM,
-                "supported only on PowerVM platform")
+    @skip_unless(is_power_vm,
+                 "supported only on PowerVM platform")
     def setUp(self):
         '''
         To check and interfaces
@@ -19,9 +19,9 @@
 #   https://github.com/autotest/autotest-client-tests/tree/master/dbench
 
 import os
+import sys
 import re
 import multiprocessing
-import json
 
 from avocado import Test
 from avocado import main
@@ -30,6 +30,10 @@ from avocado.utils import process
 from avocado.utils import build
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, os.pardir))
+from testlib.metrics import metric, emit_metrics  # noqa
+
 
 class Dbench(Test):
 
@@ -82,8 +86,10 @@ class Dbench(Test):
         self.results = process.system_output(cmd).decode("utf-8")
         pattern = re.compile(r"Throughput (.*?) MB/sec (.*?) procs")
         (throughput, procs) = pattern.findall(self.results)[0]
-        self.whiteboard = json.dumps({'throughput': throughput,
-                                      'procs': procs})
+        emit_metrics(self, 'dbench', 'nprocs=%s,seconds=%s %s' %
+                     (nprocs, seconds, args),
+                     [metric('throughput', throughput, 'MB/s'),
+                      metric('procs', procs, 'procs')])
 
 
 if __name__ == "__main__":
@@ -22,8 +22,12 @@ Disktest test
 """
 
 import glob
+import json
+import multiprocessing
 import os
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from avocado import Test
 from avocado import main
@@ -55,6 +59,8 @@ class Disktest(Test):
         :param gigabytes: Disk space that will be used for the test to run.
         :param chunk_mb: Size of the portion of the disk used to run the test.
                         Cannot be smaller than the total amount of RAM.
+        :param max_workers: Number of chunks tested concurrently, defaults
+                            to the number of cpus.
         """
         softm = SoftwareManager()
         if not softm.check_installed("gcc") and not softm.install("gcc"):
@@ -88,6 +94,8 @@ class Disktest(Test):
                         "(%s > %s)" % (self.chunk_mb, memory_mb))
 
         self.no_chunks = 1024 * gigabytes // self.chunk_mb
+        self.max_workers = int(self.params.get(
+            'max_workers', default=multiprocessing.cpu_count()))
         if self.no_chunks == 0:
             self.cancel("Free disk space is lower than chunk size (%s, %s)"
                         % (1024 * gigabytes, self.chunk_mb))
@@ -123,33 +131,51 @@ class Disktest(Test):
 
     def one_disk_chunk(self, disk, chunk):
         """
-        Tests one part of the disk by spawning a disktest instance.
+        Tests one part of the disk by running a disktest instance.
         :param disk: Directory (usually a mountpoint).
         :param chunk: Portion of the disk used.
+        :return: dict with the chunk result, log and throughput
         """
-        cmd = ("%s/disktest -m %d -f %s/testfile.%d -i -S >> \"%s\" 2>&1" %
-               (self.teststmpdir, self.chunk_mb, disk, chunk, self.disk_log))
-
-        proc = process.get_sub_process_klass(cmd)(cmd, shell=True,
-                                                  verbose=False)
-        pid = proc.start()
-        return pid, proc
+        chunk_log = os.path.join(self.outputdir, "chunk.%d.log" % chunk)
+        cmd = ("%s/disktest -m %d -f %s/testfile.%d -i -S > \"%s\" 2>&1" %
+               (self.teststmpdir, self.chunk_mb, disk, chunk, chunk_log))
+        start = time.time()
+        result = process.run(cmd, shell=True, ignore_status=True,
+                             verbose=False)
+        seconds = time.time() - start
+        return {'chunk': chunk, 'log': chunk_log, 'seconds': seconds,
+                'mb_per_sec': self.chunk_mb / seconds,
+                'exit_status': result.exit_status}
 
     def test(self):
         """
-        Runs one iteration of disktest.
+        Runs one iteration of disktest, testing max_workers chunks at once.
 
         """
-        procs = []
         errors = []
-        for i in range(self.no_chunks):
-            self.log.debug("Testing chunk %s...", i)
-            procs.append(self.one_disk_chunk(self.dirs, i))
-            for pid, proc in procs:
-                if proc.wait():
-                    errors.append(str(pid))
+        results = []
+        self.log.info("Testing %s chunks, %s at a time", self.no_chunks,
+                      self.max_workers)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            chunks = [executor.submit(self.one_disk_chunk, self.dirs, i)
+                      for i in range(self.no_chunks)]
+            with open(self.disk_log, 'a') as disk_log:
+                for job in as_completed(chunks):
+                    result = job.result()
+                    results.append(result)
+                    with open(result['log']) as chunk_log:
+                        disk_log.write("==> chunk %d <==\n" % result['chunk'])
+                        disk_log.write(chunk_log.read())
+                    disk_log.flush()
+                    self.log.debug("Chunk %d: %.2f MB/s in %.2f s, exit %d",
+                                   result['chunk'], result['mb_per_sec'],
+                                   result['seconds'], result['exit_status'])
+                    if result['exit_status']:
+                        errors.append(str(result['chunk']))
+        results.sort(key=lambda result: result['chunk'])
+        self.whiteboard = json.dumps(results)
         if errors:
-            self.fail("The %s pid(s) failed, please check the logs and %s"
+            self.fail("The %s chunk(s) failed, please check the logs and %s"
                       " for details." % (", ".join(errors), self.disk_log))
 
     def tearDown(self):
@@ -23,6 +23,8 @@ FIO Test
 """
 
 import os
+import sys
+import json
 
 from avocado import Test
 from avocado import main
@@ -33,6 +35,72 @@ from avocado.utils.partition import Partition
 from avocado.utils.software_manager import SoftwareManager
 from avocado.utils.partition import PartitionError
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, os.pardir))
+from testlib.build_cache import build_cache_key, restore_build  # noqa
+from testlib.build_cache import store_build  # noqa
+from testlib.packages import install_packages  # noqa
+
+
+FIO_PERCENTILES = {'p50': '50.000000', 'p99': '99.000000',
+                   'p99.9': '99.900000', 'p99.99': '99.990000'}
+
+
+def parse_fio_json(output):
+    """
+    Extracts per job read/write iops, bandwidth (KiB/s) and completion
+    latency percentiles (usec) from fio --output-format=json(+) output.
+
+    The numjobs clones of a job share its name: their iops and bandwidth
+    are summed and the worst latency percentiles are kept.
+    """
+    results = {}
+    for job in output['jobs']:
+        ops = results.setdefault(job['jobname'], {})
+        for operation in ['read', 'write']:
+            stats = job[operation]
+            if not (stats.get('io_bytes') or stats.get('io_kbytes')):
+                continue
+            if 'clat_ns' in stats:
+                percentiles = stats['clat_ns'].get('percentile', {})
+                scale = 1000.0
+            else:
+                # fio < 3.0 reports latencies in usec
+                percentiles = stats['clat'].get('percentile', {})
+                scale = 1.0
+            metrics = ops.setdefault(operation, {'iops': 0, 'bw': 0})
+            metrics['iops'] += stats['iops']
+            metrics['bw'] += stats['bw']
+            for name, key in FIO_PERCENTILES.items():
+                if key in percentiles:
+                    name = 'clat_%s' % name
+                    metrics[name] = max(metrics.get(name, 0),
+                                        percentiles[key] / scale)
+    return results
+
+
+def compare_fio_results(results, baseline, threshold):
+    """
+    Returns the metrics which regressed by more than threshold percent
+    against the baseline: lower iops/bw or higher latency
+    """
+    regressions = []
+    for job, ops in results.items():
+        for operation, metrics in ops.items():
+            base = baseline.get(job, {}).get(operation, {})
+            for metric, value in metrics.items():
+                if not base.get(metric):
+                    continue
+                change = 100.0 * (value - base[metric]) / base[metric]
+                if metric.startswith('clat'):
+                    change = -change
+                if change < -threshold:
+                    regressions.append("%s %s %s: %s vs baseline %s "
+                                       "(%.1f%%)" % (job, operation, metric,
+                                                     value, base[metric],
+                                                     change))
+    return regressions
+
 
 class FioTest(Test):
 
@@ -44,6 +112,11 @@ class FioTest(Test):
 
     :param fio_tarbal: name of the tarbal of fio suite located in deps path
     :param fio_job: config defining set of executed tests located in deps path
+    :param build_cache_dir: directory holding cached fio builds
+    :param build_cache_size: size cap of the build cache in MB
+    :param fio_baseline: fio_results.json of a previous run to compare with
+    :param regression_threshold: tolerated degradation against the
+                                 baseline, in percent
     """
 
     def setUp(self):
@@ -55,10 +128,19 @@ class FioTest(Test):
         self.disk = self.params.get('disk', default=None)
         self.dirs = self.params.get('dir', default=self.workdir)
         fstype = self.params.get('fs', default='ext4')
+        cache_dir = self.params.get('build_cache_dir', default=os.path.join(
+            self.cache_dirs[0], 'build_cache'))
+        cache_size = self.params.get('build_cache_size', default=4096)
         tarball = self.fetch_asset(url)
-        archive.extract(tarball, self.teststmpdir)
         self.sourcedir = os.path.join(self.teststmpdir, "fio")
-        build.make(self.sourcedir)
+        key = build_cache_key(tarball, distro.detect().arch)
+        if restore_build(cache_dir, key, self.sourcedir):
+            self.log.info("Reusing cached fio build %s", key)
+        else:
+            archive.extract(tarball, self.teststmpdir)
+            build.make(self.sourcedir)
+            store_build(cache_dir, key, self.sourcedir,
+                        cache_size * 1024 * 1024)
 
         smm = SoftwareManager()
         if fstype == 'btrfs':
@@ -76,10 +158,11 @@ class FioTest(Test):
         else:
             pkg_list = ['libaio', 'libaio-devel']
 
-        for pkg in pkg_list:
-            if pkg and not smm.check_installed(pkg) and not smm.install(pkg):
-                self.cancel("Package %s is missing and could not be installed"
-                            % pkg)
+        memo_file = os.path.join(self.teststmpdir, 'installed_packages.json')
+        missing = install_packages(smm, pkg_list, memo_file)
+        if missing:
+            self.cancel("Package %s is missing and could not be installed"
+                        % ", ".join(missing))
 
         if self.disk is not None:
             self.part_obj = Partition(self.disk, mountpoint=self.dirs)
@@ -103,11 +186,44 @@ class FioTest(Test):
         """
         self.log.info("Test will run on %s", self.dirs)
         fio_job = self.params.get('fio_job', default='fio-simple.job')
-        cmd = '%s/fio %s %s --filename=%s' % (self.sourcedir,
-                                              self.get_data(fio_job),
-                                              self.dirs, self.fio_file)
+        json_file = os.path.join(self.outputdir, 'fio.json')
+        cmd = '%s/fio --output-format=json+ --output=%s %s %s --filename=%s' \
+            % (self.sourcedir, json_file, self.get_data(fio_job), self.dirs,
+               self.fio_file)
         process.system(cmd)
 
+        with open(json_file) as fio_output:
+            results = parse_fio_json(json.load(fio_output))
+        self.whiteboard = json.dumps(results)
+        with open(os.path.join(self.outputdir,
+                               'fio_results.json'), 'w') as results_file:
+            json.dump(results, results_file, indent=4)
+        for job, ops in results.items():
+            for operation, metrics in ops.items():
+                self.log.info("%s %s: %s", job, operation, metrics)
+
+        baseline = self.params.get('fio_baseline', default=None)
+        if baseline:
+            if not os.path.isabs(baseline):
+                baseline_file = self.get_data(baseline)
+                if baseline_file is None:
+                    self.cancel("fio_baseline %s not found in the test data "
+                                "dirs, give an absolute path" % baseline)
+                baseline = baseline_file
+            elif not os.path.isfile(baseline):
+                self.cancel("fio_baseline %s does not exist" % baseline)
+            threshold = float(self.params.get('regression_threshold',
+                                              default=10))
+            with open(baseline) as baseline_file:
+                regressions = compare_fio_results(results,
+                                                  json.load(baseline_file),
+                                                  threshold)
+            if regressions:
+                for regression in regressions:
+                    self.log.error(regression)
+                self.fail("fio regressed by more than %s%% against %s"
+                          % (threshold, baseline))
+
     def tearDown(self):
         '''
         Cleanup of disk used to perform this test
@@ -21,8 +21,10 @@
 #   copyright: 2008 Red Hat, Inc.
 
 import os
+import sys
 import re
 import json
+import math
 import logging
 
 from avocado import Test
@@ -31,15 +33,70 @@ from avocado.utils import archive
 from avocado.utils import process
 from avocado.utils import build
 from avocado.utils import distro
-from avocado.utils import data_structures
 from avocado.utils import astring
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, os.pardir))
+from testlib.build_cache import build_cache_key, restore_build  # noqa
+from testlib.build_cache import store_build  # noqa
+
 
 _LABELS = ['file_size', 'record_size', 'write', 'rewrite', 'read', 'reread',
            'randread', 'randwrite', 'bkwdread', 'recordrewrite', 'strideread',
            'fwrite', 'frewrite', 'fread', 'freread']
 
+_CHILDREN_RE = re.compile(r'Children see throughput for\s+(\d+)\s+(.+?)\s*='
+                          r'\s*([\d.]+) kB/sec', re.I)
+_PARENT_RE = re.compile(r'Parent sees throughput for\s+(\d+)\s+(.+?)\s*='
+                        r'\s*([\d.]+) kB/sec', re.I)
+_PER_THREAD_RE = re.compile(r'(Min|Max|Avg) throughput per (?:thread|process)'
+                            r'\s*=\s*([\d.]+) kB/sec', re.I)
+_MIN_XFER_RE = re.compile(r'Min xfer\s*=\s*([\d.]+) kB', re.I)
+_CHILD_RE = re.compile(r'Child\[(\d+)\] xfer count\s*=\s*([\d.]+) kB,\s*'
+                       r'Throughput\s*=\s*([\d.]+) kB/sec', re.I)
+
+
+def parse_throughput(output):
+    """
+    Parses the output of IOzone throughput mode (-t) runs.
+
+    :param output: IOzone output, possibly of several runs with different
+                   numbers of threads.
+    :return: dict of section (e.g. initial_writers) to a dict of thread count
+             to the children and parent aggregates (kids, parent), the min,
+             max and avg throughput per thread, the min xfer and the per
+             child (xfer, throughput) when reported, all in kB(/sec).
+    """
+    results = {}
+    stats = None
+    for line in output.splitlines():
+        match = _CHILDREN_RE.search(line)
+        if match:
+            section = match.group(2).strip().replace(' ', '_')
+            stats = {'kids': float(match.group(3)), 'children': []}
+            results.setdefault(section, {})[int(match.group(1))] = stats
+            continue
+        if stats is None:
+            continue
+        match = _PARENT_RE.search(line)
+        if match:
+            stats['parent'] = float(match.group(3))
+            continue
+        match = _PER_THREAD_RE.search(line)
+        if match:
+            stats[match.group(1).lower()] = float(match.group(2))
+            continue
+        match = _MIN_XFER_RE.search(line)
+        if match:
+            stats['min_xfer'] = float(match.group(1))
+            continue
+        match = _CHILD_RE.search(line)
+        if match:
+            stats['children'].append((float(match.group(2)),
+                                      float(match.group(3))))
+    return results
+
 
 class IOzoneAnalyzer(object):
 
@@ -51,42 +108,29 @@ class IOzoneAnalyzer(object):
     * Summary of throughput for all file sizes
     * Summary of throughput for all record sizes
 
-    If more than one file is provided to the analyzer object, a comparison
-    between the two runs is made, searching for regressions in performance.
+    If more than one file is provided to the analyzer object, the first run
+    is compared against the geometric mean of all the others, searching for
+    regressions in performance per operation and size.
     """
 
-    def __init__(self, log, list_files, output_dir):
+    def __init__(self, log, list_files, output_dir, threshold=5):
         self.list_files = list_files
         if not os.path.isdir(output_dir):
             os.makedirs(output_dir)
         self.output_dir = output_dir
         self.log = log
+        self.threshold = threshold
+        self.regressions = []
         self.log.info("Results will be stored in %s", output_dir)
 
     @staticmethod
-    def average_performance(results, size=None):
-        """
-        Flattens a list containing performance results.
-        :param results: List of n lists containing data from performance runs.
-        :param size: Numerical value of a size (say, file_size) that was used
-                     to filter the original results list.
-        :return: List with 1 list containing average data from the performance
-                 run.
-        """
-        average_line = []
-        if size is not None:
-            average_line.append(size)
-        for i in range(2, 15):
-            average = data_structures.geometric_mean(
-                [line[i] for line in results]) / 1024.0
-            average = int(average)
-            average_line.append(average)
-        return average_line
-
-    def process_results(self, results, label=None):
+    def process_results(results, label=None):
         """
         Process a list of IOzone results according to label.
 
+        The geometric means of all the groups are computed in a single pass
+        over the results, summing up the logs of each column per group.
+
         :label: IOzone column label that we'll use to filter and compute
                 geometric mean results, in practical term either 'file_size'
                 or 'record_size'.
@@ -94,19 +138,72 @@ class IOzoneAnalyzer(object):
         :return: A list of n-? x (m-1) columns with geometric averages for
                 values of each label (ex, average for all file_sizes).
         """
-        performance = []
-        if label is not None:
-            index = _LABELS.index(label)
-            sizes = data_structures.ordered_list_unique(
-                [line[index] for line in results])
-            for size in sizes:
-                r_results = [line for line in results if line[index] == size]
-                performance.append(self.average_performance(r_results, size))
-        else:
-            performance.append(self.average_performance(results))
+        index = _LABELS.index(label) if label is not None else None
+        groups = {}
+        for line in results:
+            key = line[index] if index is not None else None
+            log_sums = groups.get(key)
+            if log_sums is None:
+                log_sums = groups[key] = [0.0] * 13 + [0]
+            for column, value in enumerate(line[2:15]):
+                log_sums[column] += (math.log(value) if value > 0
+                                     else float('-inf'))
+            log_sums[13] += 1
 
+        performance = []
+        for key, log_sums in groups.items():
+            count = log_sums.pop()
+            average_line = [] if key is None else [key]
+            average_line.extend(int(math.exp(log_sum / count) / 1024.0)
+                                for log_sum in log_sums)
+            performance.append(average_line)
         return performance
 
+    def compare_runs(self, runs, label):
+        """
+        Compares the first run against the geometric mean of the other runs,
+        matching the lines by size.
+
+        :param runs: List of process_results() matrices, one per run.
+        :param label: Name of the size column, used to flag regressions.
+        :return: Tuple of the % difference matrix, improvements, regressions
+                 and compared cells.
+        """
+        history = {}
+        for run in runs[1:]:
+            for line in run:
+                history.setdefault(line[0], []).append(line[1:])
+        matrix = []
+        improvements = regressions = total = 0
+        for line in runs[0]:
+            previous = history.get(line[0])
+            if not previous:
+                continue
+            new_line = [line[0]]
+            for column, value in enumerate(line[1:]):
+                values = [run_line[column] for run_line in previous]
+                if not all(values):
+                    new_line.append(".")
+                    continue
+                base = math.exp(math.fsum(math.log(val) for val in values) /
+                                len(values))
+                diff = 100.0 * (value - base) / base
+                total += 1
+                if diff < -self.threshold:
+                    regressions += 1
+                    new_line.append("%.1f" % diff)
+                    self.regressions.append(
+                        "%s %s %s: %d MB/s vs %.0f MB/s (%.1f%%)"
+                        % (label, line[0], _LABELS[column + 2], value, base,
+                           diff))
+                elif diff > self.threshold:
+                    improvements += 1
+                    new_line.append("+%.1f" % diff)
+                else:
+                    new_line.append(".")
+            matrix.append(new_line)
+        return matrix, improvements, regressions, total
+
     @staticmethod
     def parse_file(p_file):
         """
@@ -196,10 +293,10 @@ class IOzoneAnalyzer(object):
 
     def report_comparison(self, record, files):
         """
-        Generates comparison data for 2 IOZone runs.
+        Generates comparison data for IOZone runs.
 
-        It compares 2 sets of nxm results and outputs a table with differences.
-        If a difference higher or smaller than 5% is found, a warning is
+        It outputs the tables of differences between the compared runs. If a
+        difference higher or smaller than threshold% is found, a warning is
         triggered.
 
         :param record: Tuple with 4 elements containing results for record
@@ -225,9 +322,9 @@ class IOzoneAnalyzer(object):
         self.log.info("")
         self.log.info("REGRESSIONS: %d (%.2f%%)    Improvements: %d (%.2f%%)",
                       record_regressions,
-                      (100 * record_regressions / float(record_total)),
+                      (100 * record_regressions / float(record_total or 1)),
                       record_improvements,
-                      (100 * record_improvements / float(record_total)))
+                      (100 * record_improvements / float(record_total or 1)))
         self.log.info("")
 
         self.log.info("")
@@ -239,23 +336,21 @@ class IOzoneAnalyzer(object):
             file_size, header=header_list))
         self.log.info("REGRESSIONS: %d (%.2f%%)    Improvements: %d (%.2f%%)",
                       file_regressions,
-                      (100 * file_regressions / float(file_total)),
+                      (100 * file_regressions / float(file_total or 1)),
                       file_improvements,
-                      (100 * file_improvements / float(file_total)))
+                      (100 * file_improvements / float(file_total or 1)))
         self.log.info("")
 
     def analyze(self):
         """
         Analyzes and eventually compares sets of IOzone data.
         """
-        overall = []
         record_size = []
         file_size = []
         for path in self.list_files:
-            c_file = open(path, 'r')
             self.log.info('FILE: %s', path)
-
-            results = self.parse_file(c_file)
+            with open(path, 'r') as c_file:
+                results = self.parse_file(c_file)
 
             overall_results = self.process_results(results)
             record_size_results = self.process_results(results, 'record_size')
@@ -263,15 +358,15 @@ class IOzoneAnalyzer(object):
             self.report(overall_results, record_size_results,
                         file_size_results)
 
-            if len(self.list_files) == 2:
-                overall.append(overall_results)
-                record_size.append(record_size_results)
-                file_size.append(file_size_results)
+            record_size.append(record_size_results)
+            file_size.append(file_size_results)
 
-        if len(self.list_files) == 2:
-            record_comparison = data_structures.compare_matrices(*record_size)
-            file_comparison = data_structures.compare_matrices(*file_size)
+        if len(self.list_files) > 1:
+            record_comparison = self.compare_runs(record_size, 'record_size')
+            file_comparison = self.compare_runs(file_size, 'file_size')
             self.report_comparison(record_comparison, file_comparison)
+            for regression in self.regressions:
+                self.log.warning("REGRESSION: %s", regression)
 
 
 class IOzonePlotter(object):
@@ -283,14 +378,26 @@ class IOzonePlotter(object):
     generate the graphs.
     """
 
-    def __init__(self, log, results_file, output_dir):
-        self.active = True
-        s_mg = SoftwareManager()
+    def __init__(self, log, results_file, output_dir, mode='background'):
+        """
+        :param mode: 'background' renders all graphs in one gnuplot session
+                     that runs while the test goes on (see :meth:`wait`),
+                     'foreground' waits for it, 'script' only writes the
+                     gnuplot script for later rendering and 'none' disables
+                     graph generation.
+        """
+        self.active = mode != 'none'
+        self.mode = mode
         self.log = log
-        if not s_mg.check_installed("gnuplot") and not s_mg.install("gnuplot"):
-            self.log.warn("Command gnuplot not found, disabling graph "
-                          "generation")
-            self.active = False
+        self.renderer = None
+        self.values = []
+        if self.active and mode != 'script':
+            s_mg = SoftwareManager()
+            if (not s_mg.check_installed("gnuplot") and
+                    not s_mg.install("gnuplot")):
+                self.log.warn("Command gnuplot not found, disabling graph "
+                              "generation")
+                self.active = False
 
         if not os.path.isdir(output_dir):
             os.makedirs(output_dir)
@@ -307,61 +414,67 @@ class IOzonePlotter(object):
 
     def generate_data_source(self):
         """
-        Creates data file without headers for gnuplot consumption.
+        Creates the data files without headers for gnuplot consumption: the
+        3D one with every result line and the 2D one with the throughput of
+        each file size averaged over the record sizes.
         """
-        results_file = open(self.results_file, 'r')
         self.datasource = os.path.join(self.output_dir, '3d-datasource')
-        datasource = open(self.datasource, 'w')
-        values = []
-        for line in results_file.readlines():
-            fields = line.split()
-            if len(fields) != 15:
-                continue
-            try:
-                values.append([int(i) for i in fields])
-                datasource.write(line)
-            except ValueError:
-                continue
-        datasource.close()
-
-    def plot_2d_graphs(self):
+        # not 2d-datasource-file: IOzoneAnalyzer.report() rewrites that
+        # one with its record size table while gnuplot may still read
+        self.datasource_2d = os.path.join(self.output_dir,
+                                          '2d-datasource-plot')
+        self.values = []
+        with open(self.results_file, 'r') as results_file:
+            for line in results_file:
+                fields = line.split()
+                if len(fields) != 15:
+                    continue
+                try:
+                    self.values.append([int(i) for i in fields])
+                except ValueError:
+                    continue
+        sums = {}
+        with open(self.datasource, 'w') as datasource:
+            for fields in self.values:
+                datasource.write(" ".join(str(i) for i in fields) + "\n")
+                total = sums.setdefault(fields[0], [0] * 14)
+                total[0] += 1
+                for index, value in enumerate(fields[2:]):
+                    total[index + 1] += value
+        with open(self.datasource_2d, 'w') as datasource:
+            for file_size in sorted(sums):
+                total = sums[file_size]
+                datasource.write("%d %s\n" % (file_size, " ".join(
+                    "%.2f" % (value / total[0]) for value in total[1:])))
+
+    def commands_2d_graphs(self):
         """
-        For each one of the throughput parameters, generate a set of gnuplot
-        commands that will create a parametric surface with file size vs.
-        record size vs. throughput.
+        For each one of the throughput parameters, generate the gnuplot
+        commands that will create a graph of file size vs. throughput.
         """
-        datasource_2d = os.path.join(self.output_dir, '2d-datasource-file')
+        commands = ""
         for index, label in zip(range(2, 15), _LABELS[2:]):
-            commands_path = os.path.join(self.output_dir, '2d-%s.do' % label)
-            commands = ""
+            commands += "reset\n"
             commands += "set title 'Iozone performance: %s'\n" % label
             commands += "set logscale x\n"
             commands += "set xlabel 'File size (KB)'\n"
-            commands += "set ylabel 'Througput (MB/s)'\n"
+            commands += "set ylabel 'Througput (KB/s)'\n"
             commands += "set terminal png small size 450 350\n"
             commands += "set output '%s'\n" % os.path.join(self.output_dir,
                                                            '2d-%s.png' % label)
             commands += ("plot '%s' using 1:%s title '%s' with lines \n" %
-                         (datasource_2d, index, label))
-            commands_file = open(commands_path, 'w')
-            commands_file.write(commands)
-            commands_file.close()
-            try:
-                process.system("gnuplot \"%s\"" % commands_path, shell=True)
-            except process.CmdError:
-                self.log.error("Problem plotting from commands file %s",
-                               commands_path)
+                         (self.datasource_2d, index, label))
+        return commands
 
-    def plot_3d_graphs(self):
+    def commands_3d_graphs(self):
         """
-        For each one of the throughput parameters, generate a set of gnuplot
+        For each one of the throughput parameters, generate the gnuplot
         commands that will create a parametric surface with file size vs.
         record size vs. throughput.
         """
-        # FIXME:Creating 3d-graphs - to be updated with new version of gnuplot
-        for index, label in zip(range(1, 14), _LABELS[2:]):
-            commands_path = os.path.join(self.output_dir, '%s.do' % label)
-            commands = ""
+        commands = ""
+        for index, label in zip(range(3, 16), _LABELS[2:]):
+            commands += "reset\n"
             commands += "set title 'Iozone performance: %s'\n" % label
             commands += "set grid lt 2 lw 1\n"
             commands += "set surface\n"
@@ -382,22 +495,67 @@ class IOzonePlotter(object):
                                                            '%s.png' % label)
             commands += ("splot '%s' using 1:2:%s title '%s'\n" %
                          (self.datasource, index, label))
-            commands_file = open(commands_path, 'w')
+        return commands
+
+    def plot_2d_graphs(self):
+        """
+        Plot the 2D graphs only.
+        """
+        self.render(self.commands_2d_graphs())
+
+    def plot_3d_graphs(self):
+        """
+        Plot the 3D graphs only.
+        """
+        self.render(self.commands_3d_graphs())
+
+    def render(self, commands):
+        """
+        Writes the gnuplot script and renders it in a single gnuplot
+        session, according to the plotting mode.
+        """
+        if not self.active or not self.values:
+            return
+        commands_path = os.path.join(self.output_dir, 'iozone.do')
+        with open(commands_path, 'w') as commands_file:
             commands_file.write(commands)
-            commands_file.close()
-            try:
-                process.system("gnuplot \"%s\"" % commands_path, shell=True)
-            except process.CmdError:
-                self.log.error("Problem plotting from commands file %s",
-                               commands_path)
+        if self.mode == 'script':
+            self.log.info("Graphs not rendered, run 'gnuplot %s' to render "
+                          "them", commands_path)
+            return
+        self.wait()
+        self.renderer = process.SubProcess("gnuplot \"%s\"" % commands_path,
+                                           shell=True)
+        self.renderer.start()
+        if self.mode != 'background':
+            self.wait()
+
+    def wait(self):
+        """
+        Waits for a rendering gnuplot session to finish, if any.
+        """
+        if self.renderer is None:
+            return
+        if self.renderer.wait() != 0:
+            self.log.error("Problem plotting from commands file %s",
+                           os.path.join(self.output_dir, 'iozone.do'))
+        self.renderer = None
+
+    def stop(self):
+        """
+        Stops a rendering gnuplot session, if any.
+        """
+        if self.renderer is None:
+            return
+        self.renderer.terminate()
+        self.renderer.wait()
+        self.renderer = None
 
     def plot_all(self):
         """
         Plot all graphs that are to be plotted, provided that we have gnuplot.
         """
-        if self.active:
-            self.plot_2d_graphs()
-            self.plot_3d_graphs()
+        self.render(self.commands_2d_graphs() + self.commands_3d_graphs())
 
 
 class IOZone(Test):
@@ -416,39 +574,43 @@ class IOZone(Test):
         '''
 
         self.base_dir = os.path.abspath(self.basedir)
+        self.plotter = None
         smm = SoftwareManager()
         for package in ['gcc', 'make', 'patch']:
             if not smm.check_installed(package) and not smm.install(package):
                 self.cancel("%s is needed for the test to be run" % package)
         tarball = self.fetch_asset(
             'http://www.iozone.org/src/current/iozone3_434.tar')
-        archive.extract(tarball, self.teststmpdir)
         version = os.path.basename(tarball.split('.tar')[0])
         self.sourcedir = os.path.join(self.teststmpdir, version)
-
         make_dir = os.path.join(self.sourcedir, 'src', 'current')
-        os.chdir(make_dir)
         patch = self.params.get('patch', default='makefile.patch')
         patch = self.get_data(patch)
-        process.run('patch -p3 < %s' % patch, shell=True)
 
         d_distro = distro.detect()
         arch = d_distro.arch
         if arch == 'ppc':
-            build.make(make_dir, extra_args='linux-powerpc')
+            target = 'linux-powerpc'
         elif arch == 'ppc64' or arch == 'ppc64le':
-            build.make(make_dir, extra_args='linux-powerpc64')
+            target = 'linux-powerpc64'
         elif arch == 'x86_64':
-            build.make(make_dir, extra_args='linux-AMD64')
+            target = 'linux-AMD64'
         else:
-            build.make(make_dir, extra_args='linux')
-
-    @staticmethod
-    def __get_section_name(desc):
-        """
-        Returns section name with '_' replacing ' '
-        """
-        return desc.strip().replace(' ', '_')
+            target = 'linux'
+
+        cache_dir = self.params.get('build_cache_dir', default=os.path.join(
+            self.cache_dirs[0], 'build_cache'))
+        cache_size = self.params.get('build_cache_size', default=4096)
+        with open(patch, 'rb') as patch_file:
+            key = build_cache_key(tarball, patch_file.read(), arch, target)
+        if restore_build(cache_dir, key, self.sourcedir):
+            self.log.info("Reusing cached IOzone build %s", key)
+            return
+        archive.extract(tarball, self.teststmpdir)
+        os.chdir(make_dir)
+        process.run('patch -p3 < %s' % patch, shell=True)
+        build.make(make_dir, extra_args=target)
+        store_build(cache_dir, key, self.sourcedir, cache_size * 1024 * 1024)
 
     def generate_keyval(self):
         """
@@ -472,73 +634,72 @@ class IOZone(Test):
                     key_name = "%d-%d-%s" % (fields[0], fields[1], lin)
                     keylist[key_name] = val
         else:
-            child_regexp = re.compile(r'Children see throughput for[s]+'
-                                      r'([d]+)s+([-w]+[-ws]*)=[s]+([d.]*) '
-                                      'KB/sec')
-            parent_regexp = re.compile(r'Parent sees throughput for[s]+'
-                                       r'([d]+)s+([-w]+[-ws]*)=[s]+([d.]*) '
-                                       'KB/sec')
-
-            kbsec_regexp = re.compile(r'=[s]+([d.]*) KB/sec')
-            kbval_regexp = re.compile(r'=[s]+([d.]*) KB')
-
-            section = None
-            w_count = 0
-
-            for line in self.results.splitlines():
-                line = line.strip()
-
-                # Check for the beginning of a new result section
-                match = child_regexp.search(line)
-                if match:
-                    # Extract the section name and the worker count
-                    w_count = int(match.group(1))
-                    section = self.__get_section_name(match.group(2))
-
-                    # Output the appropriate keyval pair
-                    key_name = '%s-%d-kids' % (section, w_count)
-                    keylist[key_name] = match.group(3)
-                    continue
-
-                # Check for any other interesting lines
-                if '=' in line:
-                    # Is it something we recognize? First check for parent.
-                    match = parent_regexp.search(line)
-                    if match:
-                        # The section name and the worker count better match
-                        p_count = int(match.group(1))
-                        p_secnt = self.__get_section_name(match.group(2))
-                        if p_secnt != section or p_count != w_count:
-                            continue
-
-                        # Set the base name for the keyval
-                        basekey = 'parent'
-                    else:
-                        # Check for the various 'throughput' values
-                        if line[3:26] == ' throughput per thread ':
-                            basekey = line[0:3]
-                            match_x = kbsec_regexp
-                        else:
-                            # The only other thing we expect is 'Min xfer'
-                            if not line.startswith('Min xfer '):
-                                continue
-                            basekey = 'MinXfer'
-                            match_x = kbval_regexp
-
-                        match = match_x.search(line)
-                        if match:
-                            result = match.group(1)
-                            key_name = "%s-%d-%s" % (section, w_count, basekey)
-                            keylist[key_name] = result
+            for section, counts in parse_throughput(self.results).items():
+                for w_count, stats in counts.items():
+                    key_base = '%s-%d' % (section, w_count)
+                    keylist['%s-kids' % key_base] = stats.get('kids')
+                    for stat, basekey in [('parent', 'parent'),
+                                          ('min', 'Min'), ('max', 'Max'),
+                                          ('avg', 'Avg'),
+                                          ('min_xfer', 'MinXfer')]:
+                        if stat in stats:
+                            keylist['%s-%s' % (key_base, basekey)] = \
+                                stats[stat]
         self.whiteboard = json.dumps(keylist, indent=1)
 
+    def report_scaling(self):
+        """
+        Records how the throughput of each operation scales with the number
+        of threads, and the thread count where it peaks.
+        """
+        sections = parse_throughput(self.results)
+        scaling = {}
+        matrix = []
+        for section in sorted(sections):
+            counts = sections[section]
+            peak = max(counts, key=lambda w_count: counts[w_count]['kids'])
+            base_count = min(counts)
+            base = counts[base_count]['kids'] / base_count
+            scaling[section] = {'peak_threads': peak, 'threads': {}}
+            for w_count in sorted(counts):
+                stats = counts[w_count]
+                efficiency = stats['kids'] / (base * w_count) if base else 0
+                scaling[section]['threads'][w_count] = {
+                    'kids': stats['kids'], 'parent': stats.get('parent'),
+                    'min': stats.get('min'), 'max': stats.get('max'),
+                    'avg': stats.get('avg'),
+                    'min_xfer': stats.get('min_xfer'),
+                    'children': stats['children'],
+                    'efficiency': efficiency}
+                matrix.append([section, w_count, "%.2f" % stats['kids'],
+                               "%.2f" % stats.get('avg', 0),
+                               "%.2f" % stats.get('min', 0),
+                               "%.2f" % stats.get('max', 0),
+                               "%.2f" % efficiency,
+                               '*' if w_count == peak else ''])
+        if not matrix:
+            self.log.warn("No throughput mode results found in IOzone output")
+            return
+        header = ['Operation', 'Threads', 'Aggregate kB/s', 'Avg kB/s',
+                  'Min kB/s', 'Max kB/s', 'Efficiency', 'Peak']
+        self.log.info("\n%s", astring.tabular_output(matrix, header))
+        with open(os.path.join(self.outputdir,
+                               'throughput_scaling.json'), 'w') as s_file:
+            json.dump(scaling, s_file, indent=1)
+
     def test(self):
         '''
         Test method for performing IOZone test and analysis.
         '''
         directory = self.params.get('dir', default=None)
         args = self.params.get('args', default=None)
-        previous_results = self.params.get('previous_results', default=None)
+        previous_results = self.params.get('previous_results',
+                                           default=None) or []
+        thread_sweep = self.params.get('thread_sweep', default=None)
+        plot_mode = self.params.get('plot_mode', default='background')
+        threshold = float(self.params.get('regression_threshold', default=5))
+        if not isinstance(previous_results, list):
+            previous_results = previous_results.split()
 
         if not directory:
             directory = self.base_dir
@@ -548,8 +709,16 @@ class IOZone(Test):
             args = '-a'
 
         cmd = os.path.join(self.sourcedir, 'src', 'current', 'iozone')
-        self.results = process.system_output('%s %s' % (cmd, args))
         self.auto_mode = ("-a" in args)
+        if thread_sweep and not self.auto_mode:
+            outputs = []
+            for w_count in str(thread_sweep).split():
+                outputs.append(process.system_output(
+                    '%s %s -t %s' % (cmd, args, w_count)).decode())
+            self.results = '\n'.join(outputs)
+        else:
+            self.results = process.system_output(
+                '%s %s' % (cmd, args)).decode()
         results_path = os.path.join(self.outputdir,
                                     'raw_output')
         analysisdir = os.path.join(self.outputdir,
@@ -558,20 +727,33 @@ class IOZone(Test):
             r_file.write(self.results)
 
         self.generate_keyval()
+        if not self.auto_mode:
+            self.report_scaling()
         if self.auto_mode:
-            if previous_results:
+            # gnuplot renders in the background during the analysis and
+            # tearDown waits for it, out of the time of the test
+            self.plotter = IOzonePlotter(self.log, results_file=results_path,
+                                         output_dir=analysisdir,
+                                         mode=plot_mode)
+            self.plotter.plot_all()
+            finished = False
+            try:
                 analysis = IOzoneAnalyzer(self.log,
-                                          list_files=[results_path,
-                                                      previous_results],
-                                          output_dir=analysisdir)
-                analysis.analyze()
-            else:
-                analysis = IOzoneAnalyzer(self.log, list_files=[results_path],
-                                          output_dir=analysisdir)
+                                          list_files=([results_path] +
+                                                      previous_results),
+                                          output_dir=analysisdir,
+                                          threshold=threshold)
                 analysis.analyze()
-            plotter = IOzonePlotter(self.log, results_file=results_path,
-                                    output_dir=analysisdir)
-            plotter.plot_2d_graphs()
+                finished = True
+            finally:
+                if not finished:
+                    # no graphs for a failed analysis, nor a gnuplot left
+                    # behind
+                    self.plotter.stop()
+
+    def tearDown(self):
+        if self.plotter:
+            self.plotter.wait()
 
 
 if __name__ == "__main__":
@@ -28,6 +28,7 @@ import os
 import time
 import sys
 import json
+import threading
 from avocado import Test
 from avocado import main
 from avocado.utils import process, distro
@@ -117,10 +118,67 @@ class ParallelDd(Test):
                 cmd += " %s=%s" % (option.split(":")[0], option.split(":")[1])
             process.run(cmd, shell=True)
 
+    def run_streams(self, cmds, parallel=True):
+        """
+        Runs one dd per stream. Parallel streams are started together
+        through a barrier and timed individually.
+
+        :return: dict with the per stream timings and the aggregate rate
+        """
+        stream_mb = self.blocks_per_file * 4096.0 / (1024 * 1024)
+        streams = [{'stream': i + 1} for i in range(len(cmds))]
+        barrier = threading.Barrier(len(cmds) if parallel else 1)
+        errors = {}
+
+        def run_stream(cmd, stream):
+            barrier.wait()
+            stream['start'] = time.time()
+            result = process.run(cmd + ' > /dev/null', shell=True,
+                                 ignore_status=True)
+            stream['end'] = time.time()
+            stream['exit_status'] = result.exit_status
+            errors[stream['stream']] = result.stderr.decode('utf-8',
+                                                            'replace')
+
+        threads = [threading.Thread(target=run_stream, args=(cmd, stream))
+                   for cmd, stream in zip(cmds, streams)]
+        for thread in threads:
+            thread.start()
+            if not parallel:
+                thread.join()
+        # Wait for everyone to complete
+        for thread in threads:
+            thread.join()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # a stream without exit status died before dd returned
+        failed = [stream['stream'] for stream in streams
+                  if stream.get('exit_status', -1)]
+        if failed:
+            self.fail("dd failed in stream(s) %s: %s"
+                      % (", ".join(str(stream) for stream in failed),
+                         errors.get(failed[0], '').strip()))
+
+        first_start = min(stream['start'] for stream in streams)
+        first_end = min(stream['end'] for stream in streams)
+        last_end = max(stream['end'] for stream in streams)
+        for stream in streams:
+            stream['seconds'] = stream['end'] - stream['start']
+            stream['mb_per_sec'] = stream_mb / stream['seconds']
+            stream['skew'] = stream['end'] - first_end
+            stream['start'] -= first_start
+            stream['end'] -= first_start
+        return {'streams': streams,
+                'megabytes': stream_mb * len(cmds),
+                'seconds': last_end - first_start,
+                'mb_per_sec': stream_mb * len(cmds) / (last_end - first_start),
+                'skew': last_end - first_end}
+
     def fs_write(self):
         """
          Write out 'streams' files in parallel background task.
         """
+        cmds = []
         for i in range(self.streams):
             s_file = os.path.join(self.workdir, 'poo%d' % (i + 1))
             cmd = 'dd if=/dev/zero of=%s bs=4k count=%d' % \
@@ -128,19 +186,14 @@ class ParallelDd(Test):
             for option in self.fs_dd_woptions.split():
                 cmd += " %s=%s" % (option.split(":")[0],
                                    option.split(":")[1])
-            # Wait for everyone to complete
-            proc = process.get_sub_process_klass(cmd)(cmd + ' > /dev/null',
-                                                      shell=True)
-            proc.start()
-            proc.poll()
-            proc.wait()
-        sys.stdout.flush()
-        sys.stderr.flush()
+            cmds.append(cmd)
+        return self.run_streams(cmds)
 
     def fs_read(self):
         """
         Read in 'streams' files in parallel background tasks.
         """
+        cmds = []
         for i in range(self.streams):
             s_file = os.path.join(self.workdir, 'poo%d' % (i + 1))
             cmd = 'dd if=%s of=/dev/null bs=4k count=%d' % \
@@ -148,16 +201,8 @@ class ParallelDd(Test):
             for option in self.fs_dd_roptions.split():
                 cmd += " %s=%s" % (option.split(":")[0],
                                    option.split(":")[1])
-            if self.seq_read:
-                process.run(cmd + ' > /dev/null', shell=True)
-            else:
-                # Wait for everyone to complete
-                proc = process.get_sub_process_klass(cmd)(cmd + ' > /dev/null',
-                                                          shell=True)
-                proc.start()
-                proc.poll()
-                proc.wait()
-            sys.stdout.flush()
+            cmds.append(cmd)
+        return self.run_streams(cmds, parallel=not self.seq_read)
 
     def _device_to_fstype(self, s_file, device=None):
         """
@@ -180,8 +225,6 @@ class ParallelDd(Test):
         """
         Test Execution.
         """
-        operation = "self.megabytes / (time.time() - start)"
-
         try:
             self.fsys.unmount()
         except process.CmdError:
@@ -190,30 +233,45 @@ class ParallelDd(Test):
         self.log.info('------------- Timing raw operations ------------------')
         start = time.time()
         self.raw_io("write")
-        self.raw_write_rate = operation
+        self.raw_write_rate = self.megabytes / (time.time() - start)
 
         start = time.time()
         self.raw_io("read")
-        self.raw_read_rate = operation
+        self.raw_read_rate = self.megabytes / (time.time() - start)
 
         self.fsys.mkfs(self.fstype)
         self.fsys.mount(None)
 
         self.log.info('------------- Timing fs operations ------------------')
-        start = time.time()
-        self.fs_write()
-        self.fs_write_rate = operation
+        fs_write = self.fs_write()
+        self.fs_write_rate = fs_write['mb_per_sec']
         self.fsys.unmount()
 
         self.fsys.mount(None)
-        start = time.time()
-        self.fs_read()
-        self.fs_read_rate = operation
+        fs_read = self.fs_read()
+        self.fs_read_rate = fs_read['mb_per_sec']
+
+        for name, result in [('write', fs_write), ('read', fs_read)]:
+            self.log.info('fs %s: %d streams, %.2f MB/s aggregate, '
+                          '%.3f s completion skew', name, self.streams,
+                          result['mb_per_sec'], result['skew'])
+            for stream in result['streams']:
+                self.log.debug('stream %d: %.2f MB/s in %.3f s, skew %.3f s',
+                               stream['stream'], stream['mb_per_sec'],
+                               stream['seconds'], stream['skew'])
 
         self.whiteboard = json.dumps({'raw_write': self.raw_write_rate,
                                       'raw_read': self.raw_read_rate,
                                       'fs_write': self.fs_write_rate,
                                       'fs_read': self.fs_read_rate})
+        # one record per run, to plot the scaling over the streams count
+        with open(os.path.join(self.outputdir, 'parallel_dd.json'),
+                  'w') as results:
+            json.dump({'streams': self.streams, 'fstype': self.fstype,
+                       'raw_write': self.raw_write_rate,
+                       'raw_read': self.raw_read_rate,
+                       'fs_write': fs_write, 'fs_read': fs_read}, results,
+                      indent=4)
 
     def cleanup(self):
         """
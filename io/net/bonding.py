@@ -24,6 +24,7 @@ simultaneously increasing the bandwidth and providing redundancy.
 
 import time
 import os
+import sys
 import socket
 import fcntl
 import struct
@@ -35,10 +36,13 @@ from avocado.utils import distro
 from avocado.utils import process
 from avocado.utils import linux_modules
 from avocado.utils import genio
-from avocado.utils.ssh import Session
 from avocado.utils.network.interfaces import NetworkInterface
 from avocado.utils.network.hosts import LocalHost, RemoteHost
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, os.pardir))
+from testlib.peer import PeerConnection  # noqa
+
 
 class Bonding(Test):
     '''
@@ -116,8 +120,8 @@ class Bonding(Test):
         if self.host_interface[0:2] == 'ib':
             self.ib = True
         self.log.info("Bond Test on IB Interface? = %s", self.ib)
-        self.session = Session(self.peer_first_ipinterface, user=self.user,
-                               password=self.password)
+        self.session = PeerConnection(self.peer_first_ipinterface,
+                                      self.user, password=self.password)
         self.setup_ip()
         self.err = []
         self.remotehost = RemoteHost(self.peer_first_ipinterface, self.user,
@@ -456,6 +460,10 @@ class Bonding(Test):
         if self.err:
             self.fail("Tests failed. Details:\n%s" % "\n".join(self.err))
 
+    def tearDown(self):
+        if hasattr(self, 'session'):
+            self.session.quit()
+
 
 if __name__ == "__main__":
     main()
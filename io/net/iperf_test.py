@@ -20,6 +20,9 @@ bandwidth on IP networks.
 """
 
 import os
+import sys
+import json
+import multiprocessing
 import netifaces
 from avocado import main
 from avocado import Test
@@ -27,12 +30,62 @@ from avocado.utils.software_manager import SoftwareManager
 from avocado.utils import build
 from avocado.utils import archive
 from avocado.utils import process
+from avocado.utils import astring
 from avocado.utils.genio import read_file
 from avocado.utils.network.interfaces import NetworkInterface
 from avocado.utils.network.hosts import LocalHost, RemoteHost
-from avocado.utils.ssh import Session
 from avocado.utils.process import SubProcess
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, os.pardir))
+from testlib.peer import PeerConnection, peer_build_key, peer_build  # noqa
+
+
+def parse_iperf_csv(output, duration):
+    """
+    Parses the enhanced CSV output (-y C) of an iperf2 client run.
+
+    :return: tuple of the per interval rates of each stream in bits/s,
+             the total rate of each stream and the aggregate rate
+    """
+    intervals = {}
+    totals = {}
+    aggregate = None
+    for line in output.splitlines():
+        fields = line.strip().split(',')
+        if len(fields) < 9:
+            continue
+        try:
+            start, end = [float(i) for i in fields[6].split('-')]
+            stream = int(fields[5])
+            rate = float(fields[8])
+        except ValueError:
+            continue
+        if start == 0 and end >= duration - 0.5:
+            if stream == -1:
+                aggregate = rate
+            else:
+                totals[stream] = rate
+        elif stream != -1:
+            intervals.setdefault(stream, []).append(rate)
+    if aggregate is None:
+        aggregate = sum(totals.values())
+    return intervals, totals, aggregate
+
+
+def cpu_busy(before, after):
+    """
+    Returns the number of cpus kept busy between two /proc/stat cpu lines
+    """
+    before = [int(i) for i in before.split()[1:]]
+    after = [int(i) for i in after.split()[1:]]
+    delta = [a - b for a, b in zip(after, before)]
+    total = sum(delta)
+    if not total:
+        return 0.0
+    # idle and iowait
+    return float(total - delta[3] - delta[4]) / total
+
 
 class Iperf(Test):
     """
@@ -61,15 +114,18 @@ class Iperf(Test):
         except Exception:
             self.networkinterface.save(self.ipaddr, self.netmask)
         self.networkinterface.bring_up()
-        self.session = Session(self.peer_ip, user=self.peer_user,
-                               password=self.peer_password)
+        self.session = PeerConnection(self.peer_ip, self.peer_user,
+                                      password=self.peer_password)
         smm = SoftwareManager()
-        for pkg in ["gcc", "autoconf", "perl", "m4", "libtool"]:
+        pkgs = ["gcc", "autoconf", "perl", "m4", "libtool"]
+        for pkg in pkgs:
             if not smm.check_installed(pkg) and not smm.install(pkg):
                 self.cancel("%s package is need to test" % pkg)
-            cmd = "%s install %s" % (smm.backend.base_command, pkg)
-            output = self.session.cmd(cmd)
-            if not output.exit_status == 0:
+        # one remote shell installs all the packages on the peer
+        cmds = ["%s install %s" % (smm.backend.base_command, pkg)
+                for pkg in pkgs]
+        for pkg, status in zip(pkgs, self.session.run_batch(cmds)):
+            if status != 0:
                 self.cancel("unable to install the package %s on peer machine "
                             % pkg)
         if self.peer_ip == "":
@@ -92,17 +148,24 @@ class Iperf(Test):
         archive.extract(tarball, self.iperf)
         self.version = os.path.basename(tarball.split('.tar')[0])
         self.iperf_dir = os.path.join(self.iperf, self.version)
-        cmd = "scp -r %s %s@%s:/tmp" % (self.iperf_dir, self.peer_user,
-                                        self.peer_ip)
-        if process.system(cmd, shell=True, ignore_status=True) != 0:
+        cache_dir = self.params.get(
+            "peer_build_cache", default="/var/tmp/avocado-peer-build")
+        policy = self.params.get("peer_build_policy", default="reuse")
+        build_cmd = "./configure ppc64le;make"
+        facts = self.session.cmd("uname -m; gcc --version | head -n 1")
+        key = peer_build_key(tarball, facts.stdout.decode("utf-8"),
+                             build_cmd)
+        self.peer_dir, state = peer_build(
+            self.session, self.iperf_dir, build_cmd, "src/iperf", cache_dir,
+            key, policy)
+        if state == 'copy':
             self.cancel("unable to copy the iperf into peer machine")
-        cmd = "cd /tmp/%s;./configure ppc64le;make" % self.version
-        output = self.session.cmd(cmd)
-        if not output.exit_status == 0:
+        if state == 'build':
             self.cancel("Unable to compile Iperf into peer machine")
+        self.log.info("Iperf build on peer: %s (%s)", self.peer_dir, state)
         self.iperf_run = str(self.params.get("IPERF_SERVER_RUN", default=0))
         if self.iperf_run == '1':
-            cmd = "/tmp/%s/src/iperf -s" % self.version
+            cmd = "%s/src/iperf -s" % self.peer_dir
             cmd = self.session.get_raw_ssh_command(cmd)
             self.obj = SubProcess(cmd)
             self.obj.start()
@@ -112,32 +175,115 @@ class Iperf(Test):
         self.iperf = os.path.join(self.iperf_dir, 'src')
         self.expected_tp = self.params.get("EXPECTED_THROUGHPUT", default="85")
 
+    def peer_cpu(self):
+        """
+        Returns the cpu count and the aggregate /proc/stat line of the peer
+        """
+        output = self.session.cmd("nproc; head -n 1 /proc/stat")
+        lines = output.stdout.decode("utf-8").splitlines()
+        return int(lines[0]), lines[1]
+
+    def run_point(self, streams, window, duration, interval):
+        """
+        Runs one iperf client with streams parallel streams and the given
+        TCP window, and returns its throughput and cpu cost.
+        """
+        cmd = "./iperf -c %s -y C -P %s -t %s -i %s" % (
+            self.peer_ip, streams, duration, interval)
+        if window:
+            cmd += " -w %s" % window
+        with open('/proc/stat') as stat:
+            host_before = stat.readline()
+        peer_cpus, peer_before = self.peer_cpu()
+        result = process.run(cmd, shell=True, ignore_status=True)
+        with open('/proc/stat') as stat:
+            host_after = stat.readline()
+        peer_after = self.peer_cpu()[1]
+        if result.exit_status:
+            return None
+        intervals, totals, aggregate = parse_iperf_csv(
+            result.stdout.decode("utf-8"), duration)
+        rates = list(totals.values())
+        fairness = (sum(rates) ** 2 / (len(rates) * sum(r * r for r in rates))
+                    if rates and any(rates) else 0.0)
+        host_cores = cpu_busy(host_before, host_after) * \
+            multiprocessing.cpu_count()
+        peer_cores = cpu_busy(peer_before, peer_after) * peer_cpus
+        gbps = aggregate / 1e9
+        return {'streams': streams, 'window': window, 'gbps': gbps,
+                'stream_gbps': dict((stream, rate / 1e9)
+                                    for stream, rate in totals.items()),
+                'intervals_gbps': dict((stream, [rate / 1e9
+                                                 for rate in rates])
+                                       for stream, rates in intervals.items()),
+                'fairness': fairness, 'host_cores': host_cores,
+                'peer_cores': peer_cores,
+                'gbps_per_host_core': gbps / host_cores if host_cores else 0,
+                'gbps_per_peer_core': gbps / peer_cores if peer_cores else 0}
+
     def test(self):
         """
         Test run is a One way throughput test. In this test, we have one host
         transmitting (or receiving) data from a client. This transmit large
         messages using multiple threads or processes.
+
+        The client runs for every combination of the parallel streams,
+        MTU and TCP window sizes given in matrix_streams, matrix_mtus and
+        matrix_windows, one run with the test mtu by default.
         """
         speed = int(read_file("/sys/class/net/%s/speed" % self.iface))
         os.chdir(self.iperf)
-        cmd = "./iperf -c %s" % self.peer_ip
-        result = process.run(cmd, shell=True, ignore_status=True)
-        if result.exit_status:
-            self.fail("FAIL: Iperf Run failed")
-        for line in result.stdout.decode("utf-8").splitlines():
-            if 'sender' in line:
-                tput = int(line.split()[6].split('.')[0])
-                if tput < (int(self.expected_tp) * speed) / 100:
-                    self.fail("FAIL: Throughput Actual - %s%%, Expected - %s%%"
-                              ", Throughput Actual value - %s "
-                              % ((tput*100)/speed, self.expected_tp,
-                                 str(tput)+'Mb/sec'))
+        streams_list = str(self.params.get("matrix_streams",
+                                           default="1")).split()
+        mtus = str(self.params.get("matrix_mtus", default=self.mtu)).split()
+        windows = str(self.params.get("matrix_windows",
+                                      default="")).split() or [None]
+        duration = int(self.params.get("duration", default=10))
+        interval = int(self.params.get("interval", default=1))
+        matrix = []
+        for mtu in mtus:
+            if (self.peer_networkinterface.set_mtu(mtu) is not None or
+                    self.networkinterface.set_mtu(mtu) is not None):
+                self.log.warn("Skipping mtu %s, failed to set it", mtu)
+                continue
+            for window in windows:
+                for streams in streams_list:
+                    point = self.run_point(streams, window, duration,
+                                           interval)
+                    if point is None:
+                        self.fail("FAIL: Iperf Run failed")
+                    point['mtu'] = mtu
+                    point['link_pct'] = point['gbps'] * 1000 * 100 / speed
+                    matrix.append(point)
+        if not matrix:
+            self.fail("FAIL: no iperf run could be done")
+        with open(os.path.join(self.outputdir,
+                               'iperf_matrix.json'), 'w') as m_file:
+            json.dump(matrix, m_file, indent=1)
+        header = ['MTU', 'Window', 'Streams', 'Gbit/s', '% of link',
+                  'Fairness', 'Host cores', 'Peer cores', 'Gbit/s/host core',
+                  'Gbit/s/peer core']
+        self.log.info("\n%s", astring.tabular_output(
+            [[point['mtu'], point['window'] or 'default', point['streams'],
+              "%.2f" % point['gbps'], "%.1f" % point['link_pct'],
+              "%.3f" % point['fairness'], "%.2f" % point['host_cores'],
+              "%.2f" % point['peer_cores'],
+              "%.2f" % point['gbps_per_host_core'],
+              "%.2f" % point['gbps_per_peer_core']] for point in matrix],
+            header))
+        best = max(matrix, key=lambda point: point['gbps'])
+        tput = best['gbps'] * 1000
+        if tput < (int(self.expected_tp) * speed) / 100:
+            self.fail("FAIL: Throughput Actual - %s%%, Expected - %s%%"
+                      ", Throughput Actual value - %s "
+                      % ((tput*100)/speed, self.expected_tp,
+                         str(tput)+'Mb/sec'))
 
     def tearDown(self):
         """
         Killing Iperf process in peer machine
         """
-        cmd = "pkill iperf; rm -rf /tmp/%s" % self.version
+        cmd = "pkill iperf"
         output = self.session.cmd(cmd)
         if not output.exit_status == 0:
             self.fail("Either the ssh to peer machine machine\
@@ -148,6 +294,7 @@ class Iperf(Test):
         if self.peer_networkinterface.set_mtu('1500') is not None:
             self.cancel("Failed to set mtu in peer")
         self.networkinterface.remove_ipaddr(self.ipaddr, self.netmask)
+        self.session.quit()
 
 
 if __name__ == "__main__":
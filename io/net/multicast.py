@@ -19,16 +19,21 @@
 # then ping from peer to multicast group
 
 
+import os
+import sys
 import netifaces
 from avocado import main
 from avocado import Test
 from avocado.utils.software_manager import SoftwareManager
-from avocado.utils.ssh import Session
 from avocado.utils import process
 from avocado.utils import distro
 from avocado.utils.network.interfaces import NetworkInterface
 from avocado.utils.network.hosts import LocalHost
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, os.pardir))
+from testlib.peer import PeerConnection  # noqa
+
 
 class ReceiveMulticastTest(Test):
     '''
@@ -59,8 +64,8 @@ class ReceiveMulticastTest(Test):
             self.networkinterface.save(self.ipaddr, self.netmask)
         self.networkinterface.bring_up()
 
-        self.session = Session(self.peer, user=self.user,
-                               password=self.peer_password)
+        self.session = PeerConnection(self.peer, self.user,
+                                      password=self.peer_password)
         self.count = self.params.get("count", default="500000")
         smm = SoftwareManager()
         pkgs = ["net-tools"]
@@ -128,6 +133,7 @@ class ReceiveMulticastTest(Test):
                           ignore_status=True) != 0:
             self.log.info("unable to unset all mulicast option")
         self.networkinterface.remove_ipaddr(self.ipaddr, self.netmask)
+        self.session.quit()
 
 
 if __name__ == "__main__":
@@ -23,6 +23,7 @@ unidirectional throughput, and end-to-end latency.
 
 
 import os
+import sys
 import netifaces
 from avocado import main
 from avocado import Test
@@ -34,7 +35,10 @@ from avocado.utils import process
 from avocado.utils.genio import read_file
 from avocado.utils.network.interfaces import NetworkInterface
 from avocado.utils.network.hosts import LocalHost, RemoteHost
-from avocado.utils.ssh import Session
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, os.pardir))
+from testlib.peer import PeerConnection, peer_build_key, peer_build  # noqa
 
 
 class Netperf(Test):
@@ -64,8 +68,8 @@ class Netperf(Test):
         except Exception:
             self.networkinterface.save(self.ipaddr, self.netmask)
         self.networkinterface.bring_up()
-        self.session = Session(self.peer_ip, user=self.peer_user,
-                               password=self.peer_password)
+        self.session = PeerConnection(self.peer_ip, self.peer_user,
+                                      password=self.peer_password)
         smm = SoftwareManager()
         detected_distro = distro.detect()
         pkgs = ['gcc']
@@ -78,9 +82,11 @@ class Netperf(Test):
         for pkg in pkgs:
             if not smm.check_installed(pkg) and not smm.install(pkg):
                 self.cancel("%s package is need to test" % pkg)
-            cmd = "%s install %s" % (smm.backend.base_command, pkg)
-            output = self.session.cmd(cmd)
-            if not output.exit_status == 0:
+        # one remote shell installs all the packages on the peer
+        cmds = ["%s install %s" % (smm.backend.base_command, pkg)
+                for pkg in pkgs]
+        for pkg, status in zip(pkgs, self.session.run_batch(cmds)):
+            if status != 0:
                 self.cancel("unable to install the package %s on peer machine "
                             % pkg)
         if self.peer_ip == "":
@@ -106,14 +112,21 @@ class Netperf(Test):
         self.version = "%s-%s" % ("netperf",
                                   os.path.basename(tarball.split('.zip')[0]))
         self.neperf = os.path.join(self.netperf, self.version)
-        cmd = "scp -r %s %s@%s:/tmp/" % (self.neperf, self.peer_user,
-                                         self.peer_ip)
-        if process.system(cmd, shell=True, ignore_status=True) != 0:
+        cache_dir = self.params.get(
+            "peer_build_cache", default="/var/tmp/avocado-peer-build")
+        policy = self.params.get("peer_build_policy", default="reuse")
+        build_cmd = "./configure ppc64le;make"
+        facts = self.session.cmd("uname -m; gcc --version | head -n 1")
+        key = peer_build_key(tarball, facts.stdout.decode("utf-8"),
+                             build_cmd)
+        self.peer_dir, state = peer_build(
+            self.session, self.neperf, build_cmd, "src/netserver", cache_dir,
+            key, policy)
+        if state == 'copy':
             self.cancel("unable to copy the netperf into peer machine")
-        cmd = "cd /tmp/%s;./configure ppc64le;make" % self.version
-        output = self.session.cmd(cmd)
-        if not output.exit_status == 0:
+        if state == 'build':
             self.fail("test failed because command failed in peer machine")
+        self.log.info("netperf build on peer: %s (%s)", self.peer_dir, state)
         os.chdir(self.neperf)
         process.system('./configure ppc64le', shell=True)
         build.make(self.neperf)
@@ -129,11 +142,11 @@ class Netperf(Test):
         netperf test
         """
         if self.netperf_run == '1':
-            cmd = "chmod 777 /tmp/%s/src" % self.version
+            cmd = "chmod 777 %s/src" % self.peer_dir
             output = self.session.cmd(cmd)
             if not output.exit_status == 0:
                 self.fail("test failed because netserver not available")
-            cmd = "/tmp/%s/src/netserver" % self.version
+            cmd = "%s/src/netserver" % self.peer_dir
             output = self.session.cmd(cmd)
             if not output.exit_status == 0:
                 self.fail("test failed because netserver not available")
@@ -164,7 +177,7 @@ class Netperf(Test):
         """
         removing the data in peer machine
         """
-        cmd = "pkill netserver; rm -rf /tmp/%s" % self.version
+        cmd = "pkill netserver"
         output = self.session.cmd(cmd)
         if not output.exit_status == 0:
             self.fail("test failed because peer sys not connected")
@@ -173,6 +186,7 @@ class Netperf(Test):
         if self.peer_networkinterface.set_mtu('1500') is not None:
             self.cancel("Failed to set mtu in peer")
         self.networkinterface.remove_ipaddr(self.ipaddr, self.netmask)
+        self.session.quit()
 
 
 if __name__ == "__main__":
@@ -21,6 +21,7 @@ workload profiles
 """
 
 import os
+import sys
 import netifaces
 from avocado import main
 from avocado import Test
@@ -29,12 +30,15 @@ from avocado.utils import distro
 from avocado.utils import build
 from avocado.utils import archive
 from avocado.utils import process
-from avocado.utils.ssh import Session
 from avocado.utils.genio import read_file
 from avocado.utils.network.interfaces import NetworkInterface
 from avocado.utils.network.hosts import LocalHost, RemoteHost
 from avocado.utils.process import SubProcess
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, os.pardir))
+from testlib.peer import PeerConnection, peer_build_key, peer_build  # noqa
+
 
 class Uperf(Test):
     """
@@ -63,8 +67,8 @@ class Uperf(Test):
         except Exception:
             self.networkinterface.save(self.ipaddr, self.netmask)
         self.networkinterface.bring_up()
-        self.session = Session(self.peer_ip, user=self.peer_user,
-                               password=self.peer_password)
+        self.session = PeerConnection(self.peer_ip, self.peer_user,
+                                      password=self.peer_password)
         smm = SoftwareManager()
         detected_distro = distro.detect()
         pkgs = ["gcc", "autoconf", "perl", "m4", "git-core", "automake"]
@@ -75,9 +79,11 @@ class Uperf(Test):
         for pkg in pkgs:
             if not smm.check_installed(pkg) and not smm.install(pkg):
                 self.cancel("%s package is need to test" % pkg)
-            cmd = "%s install %s" % (smm.backend.base_command, pkg)
-            output = self.session.cmd(cmd)
-            if not output.exit_status == 0:
+        # one remote shell installs all the packages on the peer
+        cmds = ["%s install %s" % (smm.backend.base_command, pkg)
+                for pkg in pkgs]
+        for pkg, status in zip(pkgs, self.session.run_batch(cmds)):
+            if status != 0:
                 self.cancel("unable to install the package %s on peer machine "
                             % pkg)
         if self.peer_ip == "":
@@ -99,17 +105,24 @@ class Uperf(Test):
                                    expire='7d')
         archive.extract(tarball, self.teststmpdir)
         self.uperf_dir = os.path.join(self.teststmpdir, "uperf-master")
-        cmd = "scp -r %s %s@%s:/tmp" % (self.uperf_dir, self.peer_user,
-                                        self.peer_ip)
-        if process.system(cmd, shell=True, ignore_status=True) != 0:
+        cache_dir = self.params.get(
+            "peer_build_cache", default="/var/tmp/avocado-peer-build")
+        policy = self.params.get("peer_build_policy", default="reuse")
+        build_cmd = "autoreconf -fi;./configure ppc64le;make"
+        facts = self.session.cmd("uname -m; gcc --version | head -n 1")
+        key = peer_build_key(tarball, facts.stdout.decode("utf-8"),
+                             build_cmd)
+        self.peer_dir, state = peer_build(
+            self.session, self.uperf_dir, build_cmd, "src/uperf", cache_dir,
+            key, policy)
+        if state == 'copy':
             self.cancel("unable to copy the uperf into peer machine")
-        cmd = "cd /tmp/uperf-master;autoreconf -fi;./configure ppc64le;make"
-        output = self.session.cmd(cmd)
-        if not output.exit_status == 0:
+        if state == 'build':
             self.cancel("Unable to compile Uperf into peer machine")
+        self.log.info("Uperf build on peer: %s (%s)", self.peer_dir, state)
         self.uperf_run = str(self.params.get("UPERF_SERVER_RUN", default=0))
         if self.uperf_run == '1':
-            cmd = "/tmp/uperf-master/src/uperf -s &"
+            cmd = "%s/src/uperf -s &" % self.peer_dir
             cmd = self.session.get_raw_ssh_command(cmd)
             self.obj = SubProcess(cmd)
             self.obj.start()
@@ -151,7 +164,7 @@ class Uperf(Test):
         Killing Uperf process in peer machine
         """
         self.obj.stop()
-        cmd = "pkill uperf; rm -rf /tmp/uperf-master"
+        cmd = "pkill uperf"
         output = self.session.cmd(cmd)
         if not output.exit_status == 0:
             self.fail("Either the ssh to peer machine machine\
@@ -161,6 +174,7 @@ class Uperf(Test):
         if self.peer_networkinterface.set_mtu('1500') is not None:
             self.cancel("Failed to set mtu in peer")
         self.networkinterface.remove_ipaddr(self.ipaddr, self.netmask)
+        self.session.quit()
 
 
 if __name__ == "__main__":
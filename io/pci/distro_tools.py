@@ -18,13 +18,17 @@
 Test the different tools
 """
 
+import os
+import sys
+
 from avocado import main
 from avocado import Test
 from avocado.utils import process
-from avocado import skipUnless
 from avocado.utils import pci
 
-IS_POWER_VM = 'pSeries' in open('/proc/cpuinfo', 'r').read()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, os.pardir))
+from testlib.platform_facts import skip_unless, is_power_vm  # noqa
 
 
 class DisrtoTool(Test):
@@ -40,8 +44,8 @@ class DisrtoTool(Test):
         self.tool = self.params.get("tool", default='')
         self.pci_device = self.params.get("pci_device", default='')
 
-    @skipUnless(IS_POWER_VM,
-                "supported only on PowerVM platform")
+    @skip_unless(is_power_vm,
+                 "supported only on PowerVM platform")
     def lsslot(self):
         '''
         run lsslot
@@ -122,8 +126,8 @@ class DisrtoTool(Test):
         self.usys(self.tool, self.option, self.pci_device)
         return
 
-    @skipUnless(IS_POWER_VM,
-                "supported only on PowerVM platform")
+    @skip_unless(is_power_vm,
+                 "supported only on PowerVM platform")
     def ofpathname(self):
         '''
         run ofpathname
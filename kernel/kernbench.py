@@ -19,7 +19,9 @@
 # https://github.com/autotest/autotest-client-tests/commits/master/kernbench
 
 import os
+import sys
 import re
+import json
 import platform
 
 from avocado import Test
@@ -31,6 +33,11 @@ from avocado.utils import distro
 from avocado.utils import archive
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.packages import install_packages  # noqa
+from testlib.repetition import RepetitionController  # noqa
+
 
 class Kernbench(Test):
     """
@@ -114,9 +121,11 @@ class Kernbench(Test):
                          'libcap', 'libcap-devel', 'elfutils-libelf',
                          'elfutils-libelf-devel', 'openssl-devel'])
 
-        for package in deps:
-            if not smg.check_installed(package) and not smg.install(package):
-                self.cancel('%s is needed for the test to be run' % package)
+        memo_file = os.path.join(self.teststmpdir, 'installed_packages.json')
+        missing = install_packages(smg, deps, memo_file)
+        if missing:
+            self.cancel('%s is needed for the test to be run'
+                        % ", ".join(missing))
         self.kernel_version = platform.uname()[2]
         self.iterations = self.params.get('runs', default=1)
         self.threads = self.params.get(
@@ -140,25 +149,41 @@ class Kernbench(Test):
         self.log.info("Starting build the kernel")
         timefile = "%s/time_file" % self.sourcedir
         # Build kernel
-        user_time = 0
-        system_time = 0
-        elapsed_time = 0
-        for run in range(self.iterations):
-            self.log.info("Iteration: %s" % (int(run) + 1))
+        runs = []
+
+        def measure():
             self.time_build(self.threads, timefile, "")
             # Processing the timefile
             results = open(timefile).readline().strip()
             (user, system, elapsed) = self.extract_all_time_results(results)[0]
-            user_time += float(user)
-            system_time += float(system)
-            elapsed_time += float(elapsed)
+            runs.append((float(user), float(system), float(elapsed)))
+            return float(elapsed)
+
+        # a warmup build is as long as a measured one, so it is opt-in here
+        repeater = RepetitionController(
+            self.log, warmup=self.params.get('warmup_runs', default=0),
+            min_runs=self.params.get('min_runs', default=self.iterations),
+            max_runs=self.params.get('max_runs', default=self.iterations),
+            ci_target=self.params.get('ci_target', default=5),
+            time_budget=self.params.get('time_budget', default=None))
+        stats = repeater.run(measure)
+        runs = runs[repeater.warmup:]
+        user_time = sum(run[0] for run in runs)
+        system_time = sum(run[1] for run in runs)
+        elapsed_time = sum(run[2] for run in runs)
+        with open(os.path.join(self.outputdir,
+                               'repetitions.json'), 'w') as rep_file:
+            json.dump({'elapsed': stats, 'runs': runs}, rep_file, indent=1)
         # Results
         self.log.info("Performance figures:")
-        self.log.info("Iterations        : %s", self.iterations)
+        self.log.info("Iterations        : %s", len(runs))
         self.log.info("Number of threads     : %s", self.threads)
         self.log.info("User      : %s", user_time)
         self.log.info("System    : %s", system_time)
         self.log.info("Elapsed   : %s", elapsed_time)
+        self.log.info("Elapsed per build : mean %s, median %s, stddev %s, "
+                      "95%% CI +/- %s", stats['mean'], stats['median'],
+                      stats['stddev'], stats['ci'])
 
 
 if __name__ == "__main__":
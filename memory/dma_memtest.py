@@ -22,6 +22,10 @@
 import os
 import shutil
 import re
+import hashlib
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from avocado import Test
 from avocado.utils import process
 from avocado.utils import disk
@@ -29,6 +33,62 @@ from avocado.utils import archive
 from avocado.core import data_dir
 
 
+MANIFEST_BLOCK = 1 << 16
+
+
+def file_digests(path):
+    """
+    Returns the md5 digests of every MANIFEST_BLOCK bytes of path, or the
+    target of path if it is a symlink.
+    """
+    if os.path.islink(path):
+        return os.readlink(path)
+    digests = []
+    with open(path, 'rb') as data_file:
+        for block in iter(lambda: data_file.read(MANIFEST_BLOCK), b''):
+            digests.append(hashlib.md5(block).digest())
+    return digests
+
+
+def tree_files(tree):
+    """
+    Returns the paths of the files and symlinks of tree, relative to it.
+    """
+    files = []
+    for root, dirs, names in os.walk(tree):
+        names += [name for name in dirs
+                  if os.path.islink(os.path.join(root, name))]
+        for name in names:
+            files.append(os.path.relpath(os.path.join(root, name), tree))
+    return files
+
+
+def verify_file(args):
+    """
+    Compares a file of a copy to its manifest entry.
+
+    :return: None if it matches, else a message with the first offset
+             where it differs
+    """
+    path, expected = args
+    if not os.path.lexists(path):
+        return "%s: missing" % path
+    try:
+        digests = file_digests(path)
+    except (IOError, OSError) as details:
+        return "%s: %s" % (path, details)
+    if isinstance(expected, str) or isinstance(digests, str):
+        if digests != expected:
+            return "%s: symlink differs" % path
+        return None
+    for index, (ref, digest) in enumerate(
+            itertools.zip_longest(expected, digests)):
+        if ref != digest:
+            return "%s: differs at offset %s" % (path,
+                                                 index * MANIFEST_BLOCK)
+    return None
+
+
 class DmaMemtest(Test):
 
     """
@@ -63,6 +123,8 @@ class DmaMemtest(Test):
                                       '74')
         parallel = self.params.get('parallel', default=True)
         self.parallel = parallel
+        self.workers = int(self.params.get(
+            'workers', default=multiprocessing.cpu_count()))
         self.log.info('Downloading linux kernel tarball')
         self.tarball = self.fetch_asset(tarball_url, asset_hash=tarball_md5,
                                         algorithm='md5')
@@ -135,38 +197,28 @@ class DmaMemtest(Test):
             self.log.info("Wait background processes before proceed")
             for proc in parallel_procs:
                 proc.wait()
-        parallel_procs = []
-        self.log.info('Comparing test copies with base copy')
-        for j in range(self.sim_cps):
-            kernel_ver = os.path.basename(self.tarball).strip('.tar.bz2')
-            tmp_dir = 'linux.%s/%s' % (j, kernel_ver)
-            if self.parallel:
-                diff_cmd = 'diff -U3 -rN linux.orig/' + kernel_ver
-                diff_cmd += ' ' + tmp_dir
+        self.log.info('Building the digest manifest of the base copy')
+        ref_files = tree_files(self.base_dir)
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            manifest = dict(zip(ref_files, executor.map(
+                file_digests, [os.path.join(self.base_dir, rel)
+                               for rel in ref_files], chunksize=64)))
+            self.log.info('Comparing test copies with base copy')
+            for j in range(self.sim_cps):
+                tmp_dir = os.path.join(self.tmpdir, 'linux.%s' % j)
                 self.log.info("Comparing linux.orig with %s", tmp_dir)
-                obj = process.SubProcess(cmd=diff_cmd, verbose=False,
-                                         shell=True)
-                obj.start()
-                parallel_procs.append(obj)
-            else:
-                try:
-                    self.log.info('Comparing linux.orig with %s', tmp_dir)
-                    process.system('diff -U3 -rN linux.orig linux.%s' % j)
-                except process.CmdError as error:
+                errors = [error for error in executor.map(
+                    verify_file, [(os.path.join(tmp_dir, rel), digests)
+                                  for rel, digests in manifest.items()],
+                    chunksize=64) if error]
+                errors.extend("%s: not in base copy" %
+                              os.path.join(tmp_dir, rel)
+                              for rel in tree_files(tmp_dir)
+                              if rel not in manifest)
+                if errors:
                     self.nfail += 1
-                    self.log.info('Error comparing trees: %s', error)
-
-        for proc in parallel_procs:
-            out_buf = proc.get_stdout()
-            out_buf += proc.get_stderr()
-            proc.wait()
-            if out_buf != "":
-                self.nfail += 1
-                self.log.error('Error when comparing test with base copies in'
-                               'parallel')
-
-        # Clean up for the next iteration
-        parallel_procs = []
+                    self.log.error('Error comparing trees:\n%s',
+                                   "\n".join(errors))
 
         if self.nfail != 0:
             self.fail('DMA memory test failed.')
@@ -14,15 +14,24 @@
 # Author: Abdul Haleem <abdhalee@linux.vnet.ibm.com>
 
 import os
+import sys
 import glob
-import re
+import array
+import json
+import time
+import errno
 import platform
 import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from avocado import Test
 from avocado import main
-from avocado.utils import process, memory, build, archive
+from avocado.utils import process, memory, build, archive, astring
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.kmsg import KmsgMonitor  # noqa
+
 
 MEM_PATH = '/sys/devices/system/memory'
 ERRORLOG = ['WARNING: CPU:', 'Oops',
@@ -36,47 +45,234 @@ ERRORLOG = ['WARNING: CPU:', 'Oops',
             'double fault:', 'BUG: Bad page state in']
 
 
-def clear_dmesg():
-    process.run("dmesg -C ", sudo=True)
-
-
-def online(block):
+def parse_list(list_string):
+    """
+    Returns the ids of a kernel list like 0-3,8
+    """
+    ids = []
+    for item in list_string.strip().split(','):
+        if '-' in item:
+            first, last = item.split('-')
+            ids.extend(range(int(first), int(last) + 1))
+        elif item:
+            ids.append(int(item))
+    return ids
+
+
+def get_block_nodes():
+    """
+    Returns the numa node of each memory block, read from the node
+    directories once.
+    """
+    nodes = {}
+    for node_dir in glob.glob('/sys/devices/system/node/node[0-9]*'):
+        node = int(os.path.basename(node_dir)[4:])
+        for entry in os.listdir(node_dir):
+            if entry.startswith('memory') and entry[6:].isdigit():
+                nodes[entry[6:]] = node
+    return nodes
+
+
+def read_attr(path):
+    """
+    Returns the stripped content of a sysfs attribute, empty if unreadable
+    """
     try:
-        memory.hotplug(block)
-        return ""
-    except IOError:
-        return "memory%s : Resource is busy" % block
-
-
-def offline(block):
-    try:
-        memory.hotunplug(block)
-        return ""
-    except IOError:
-        return "memory%s : Resource is busy" % block
-
-
-def get_hotpluggable_blocks(path, ratio):
-    mem_blocks = []
-    for mem_blk in glob.glob(path):
-        block = re.findall(r"\d+", os.path.basename(mem_blk))[0]
-        block = re.sub(r'^\s*$', '', block)
-        if memory.is_hot_pluggable(block):
-            mem_blocks.append(block)
-
-    def chunks(num):
+        with open(path) as attr_file:
+            return attr_file.read().strip()
+    except (IOError, OSError):
+        return ''
+
+
+class MemoryInventory(object):
+
+    """
+    Inventory of the memory blocks, built in one walk of the sysfs memory
+    directory and kept in arrays sharing the same index: block id, node,
+    removable flag, state, zone and phys_index. The zone is read on first
+    use only, as reading valid_zones makes the kernel scan the pages of
+    the block.
+    """
+
+    def __init__(self, path=MEM_PATH):
+        node_of = get_block_nodes()
+        entries = []
+        for entry in os.listdir(path):
+            if entry.startswith('memory') and entry[6:].isdigit():
+                entries.append(int(entry[6:]))
+        entries.sort()
+        self.ids = array.array('l', entries)
+        # the phys_index of a block is its id
+        self.phys_index = array.array('l', entries)
+        self.nodes = array.array('i')
+        self.removable = array.array('b')
+        self.online = array.array('b')
+        # -1 until the zone of the block is read
+        self.zones = array.array('b', [-1] * len(entries))
+        self.zone_names = []
+        for block in entries:
+            block_path = os.path.join(path, 'memory%s' % block)
+            self.nodes.append(node_of.get(str(block), -1))
+            self.removable.append(
+                read_attr(os.path.join(block_path, 'removable')) == '1')
+            self.online.append(
+                read_attr(os.path.join(block_path, 'state')) == 'online')
+        self.path = path
+        self.index = dict((block, idx) for idx, block in enumerate(entries))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def node(self, block):
+        return self.nodes[self.index[int(block)]]
+
+    def zone(self, block):
+        idx = self.index[int(block)]
+        if self.zones[idx] < 0:
+            zone = (read_attr(os.path.join(self.path, 'memory%s' % block,
+                                           'valid_zones')) or
+                    'none').split()[0]
+            if zone not in self.zone_names:
+                self.zone_names.append(zone)
+            self.zones[idx] = self.zone_names.index(zone)
+        return self.zone_names[self.zones[idx]]
+
+    def is_online(self, block):
+        return bool(self.online[self.index[int(block)]])
+
+    def set_online(self, block, online):
+        idx = self.index[int(block)]
+        self.online[idx] = online
+        # the valid zones of a block change with its state
+        self.zones[idx] = -1
+
+    def select(self, node=None, online=None, removable=True, ratio=None):
         """
-        Return number of blocks in chunks of 100
+        Returns the ids of the blocks of node (any by default) in the given
+        state (any by default), hot pluggable ones unless removable is
+        False, limited to ratio percent of them if given.
         """
-        if num % 2:
-            return num // 100 + 1
-        return num // 100
-    count = chunks(len(mem_blocks) * ratio)
-    return mem_blocks[:count]
+        blocks = [str(self.ids[idx]) for idx in range(len(self.ids))
+                  if (node is None or self.nodes[idx] == node) and
+                  (online is None or self.online[idx] == online) and
+                  (not removable or self.removable[idx])]
+        if ratio is None:
+            return blocks
+        num = len(blocks) * ratio
+        # chunks of 100 blocks
+        count = num // 100 + 1 if num % 2 else num // 100
+        return blocks[:int(count)]
+
+
+class MemHotplug(object):
+
+    """
+    Onlines and offlines memory blocks, with the blocks of different numa
+    nodes handled concurrently by at most max_workers threads. Blocks busy
+    migrating their pages are retried, and the time taken by every block
+    is recorded per node.
+    """
+
+    def __init__(self, log, inventory, max_workers=None, retries=3,
+                 retry_delay=0.5):
+        self.log = log
+        self.inventory = inventory
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.retries = retries
+        self.retry_delay = retry_delay
+        with open(os.path.join(MEM_PATH, 'block_size_bytes')) as size_file:
+            self.block_size = int(size_file.read(), 16)
+        self.reports = []
+
+    def set_state(self, block, online):
+        """
+        Onlines or offlines block, retrying while it is busy.
 
+        :return: tuple of seconds taken, number of retries and error message
+                 (empty on success)
+        """
+        if self.inventory.is_online(block) == online:
+            return 0.0, 0, ""
+        state = 'online' if online else 'offline'
+        path = os.path.join(MEM_PATH, 'memory%s' % block, 'state')
+        start = time.time()
+        for retry in range(self.retries + 1):
+            try:
+                with open(path, 'w') as state_file:
+                    state_file.write(state)
+                self.inventory.set_online(block, online)
+                return time.time() - start, retry, ""
+            except (IOError, OSError) as details:
+                if (details.errno not in (errno.EBUSY, errno.EAGAIN) or
+                        retry == self.retries):
+                    return (time.time() - start, retry,
+                            "memory%s : %s failed: %s" % (block, state,
+                                                          details))
+                time.sleep(self.retry_delay)
+
+    def _node_worker(self, node, blocks, online):
+        stats = {'node': node, 'blocks': 0, 'failed': [], 'retries': 0,
+                 'block_times': []}
+        start = time.time()
+        for block in blocks:
+            seconds, retries, err = self.set_state(block, online)
+            stats['retries'] += retries
+            if err:
+                self.log.error(err)
+                stats['failed'].append(block)
+                continue
+            stats['blocks'] += 1
+            stats['block_times'].append(seconds)
+        stats['seconds'] = time.time() - start
+        return stats
+
+    def run(self, blocks, online, label=None):
+        """
+        Onlines or offlines blocks, each node in its own worker.
 
-def collect_dmesg(object):
-    object.whiteboard = process.system_output("dmesg")
+        :return: list of the per node stats
+        """
+        by_node = {}
+        for block in blocks:
+            by_node.setdefault(self.inventory.node(block), []).append(block)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._node_worker, node, node_blocks,
+                                       online)
+                       for node, node_blocks in sorted(by_node.items(),
+                                                       key=str)]
+            results = [future.result() for future in futures]
+        self.report(results, label or ('online' if online else 'offline'))
+        return results
+
+    def online(self, blocks, label=None):
+        return self.run(blocks, True, label)
+
+    def offline(self, blocks, label=None):
+        return self.run(blocks, False, label)
+
+    def report(self, results, label):
+        """
+        Logs the time, retries and throughput of each node, the slowest
+        first.
+        """
+        matrix = []
+        for stats in sorted(results, key=lambda item: -item['seconds']):
+            times = stats['block_times']
+            stats['gb_per_sec'] = (stats['blocks'] * self.block_size /
+                                   float(1 << 30) / stats['seconds']
+                                   if stats['seconds'] else 0.0)
+            matrix.append([stats['node'], stats['blocks'],
+                           len(stats['failed']), stats['retries'],
+                           "%.3f" % stats['seconds'],
+                           "%.3f" % (sum(times) / len(times) if times else 0),
+                           "%.3f" % max(times or [0]),
+                           "%.3f" % stats['gb_per_sec']])
+        header = ['Node', 'Blocks', 'Failed', 'Retries', 'Seconds',
+                  'Avg block (s)', 'Max block (s)', 'GB/s']
+        if matrix:
+            self.log.info("%s:\n%s", label,
+                          astring.tabular_output(matrix, header))
+        self.reports.append({'label': label, 'nodes': results})
 
 
 class MemStress(Test):
@@ -98,6 +294,8 @@ class MemStress(Test):
 
     def setUp(self):
 
+        self.kmsg = None
+        self.engine = None
         if not memory.check_hotplug():
             self.cancel("UnSupported : memory hotplug not enabled\n")
         smm = SoftwareManager()
@@ -117,26 +315,23 @@ class MemStress(Test):
         self.vmcount = self.params.get('vmcount', default=4)
         self.iocount = self.params.get('iocount', default=4)
         self.memratio = self.params.get('memratio', default=5)
-        self.blocks_hotpluggable = get_hotpluggable_blocks(
-            (os.path.join('%s', 'memory*') % MEM_PATH), self.memratio)
+        self.inventory = MemoryInventory()
+        self.blocks_hotpluggable = self.inventory.select(ratio=self.memratio)
+        self.engine = MemHotplug(
+            self.log, self.inventory,
+            max_workers=self.params.get('max_workers', default=None),
+            retries=self.params.get('busy_retries', default=3))
         if os.path.exists("%s/auto_online_blocks" % MEM_PATH):
             if not self.__is_auto_online():
                 self.hotplug_all(self.blocks_hotpluggable)
-        clear_dmesg()
+        self.kmsg = KmsgMonitor(ERRORLOG, max_level=4)
+        self.kmsg.start()
 
     def hotunplug_all(self, blocks):
-        for block in blocks:
-            if memory._check_memory_state(block):
-                err = offline(block)
-                if err:
-                    self.log.error(err)
+        self.engine.offline(blocks)
 
     def hotplug_all(self, blocks):
-        for block in blocks:
-            if not memory._check_memory_state(block):
-                err = online(block)
-                if err:
-                    self.log.error(err)
+        self.engine.online(blocks)
 
     @staticmethod
     def __is_auto_online():
@@ -146,14 +341,8 @@ class MemStress(Test):
             return False
 
     def __error_check(self):
-        err_list = []
-        logs = process.system_output("dmesg -Txl 1,2,3,4").splitlines()
-        for error in ERRORLOG:
-            for log in logs:
-                if error in log.decode():
-                    err_list.append(log)
-        if "\n".join(err_list):
-            collect_dmesg(self)
+        if self.kmsg.new_errors():
+            self.whiteboard = "\n".join(self.kmsg.records)
             self.fail('ERROR: Test failed, please check the dmesg logs')
 
     def run_stress(self):
@@ -176,12 +365,12 @@ class MemStress(Test):
         self.log.info("\nTEST: Memory toggle\n")
         for _ in range(self.iteration):
             for block in self.blocks_hotpluggable:
-                err = offline(block)
+                err = self.engine.set_state(block, False)[2]
                 if err:
                     self.log.error(err)
                 self.log.info("memory%s block hotunplugged", block)
                 self.run_stress()
-                err = online(block)
+                err = self.engine.set_state(block, True)[2]
                 if err:
                     self.log.error(err)
                 self.log.info("memory%s block hotplugged", block)
@@ -208,23 +397,26 @@ class MemStress(Test):
     def test_hotplug_per_numa_node(self):
         self.log.info("\nTEST: Numa Node memory off on\n")
         with open('/sys/devices/system/node/has_normal_memory', 'r') as node_file:
-            nodes = node_file.read()
-        for node in re.split("[,-]", nodes):
-            node = node.strip('\n')
+            nodes = parse_list(node_file.read())
+        mem_blocks = []
+        for node in nodes:
             self.log.info("Hotplug all memory in Numa Node %s", node)
-            mem_blocks = get_hotpluggable_blocks((
-                '/sys/devices/system/node/node%s/memory*' % node), self.memratio)
-            for block in mem_blocks:
-                self.log.info(
-                    "offline memory%s in numa node%s", block, node)
-                err = offline(block)
-                if err:
-                    self.log.error(err)
-            self.run_stress()
+            mem_blocks.extend(self.inventory.select(node=node,
+                                                    ratio=self.memratio))
+        # the nodes are offlined concurrently, one worker per node
+        self.engine.offline(mem_blocks, 'offline per numa node')
+        self.run_stress()
+        self.engine.online(mem_blocks, 'online per numa node')
         self.__error_check()
 
     def tearDown(self):
-        self.hotplug_all(self.blocks_hotpluggable)
+        if self.engine:
+            self.hotplug_all(self.blocks_hotpluggable)
+            with open(os.path.join(self.outputdir,
+                                   'memhotplug.json'), 'w') as r_file:
+                json.dump(self.engine.reports, r_file, indent=1)
+        if self.kmsg:
+            self.kmsg.stop()
 
 
 if __name__ == "__main__":
@@ -20,6 +20,7 @@ This Suite works with various options of ndctl on a NVDIMM device.
 """
 
 import os
+import sys
 import re
 import shutil
 
@@ -36,6 +37,12 @@ from avocado.utils import partition
 from avocado.utils import pmem
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.build_cache import build_cache_key, restore_build  # noqa
+from testlib.build_cache import store_build  # noqa
+from testlib.packages import install_packages  # noqa
+
 
 class NdctlTest(Test):
 
@@ -82,10 +89,14 @@ class NdctlTest(Test):
                             "" % package)
                 tarball = self.fetch_asset(
                     "http://brick.kernel.dk/snaps/fio-2.1.10.tar.gz")
-                archive.extract(tarball, self.teststmpdir)
                 fio_version = os.path.basename(tarball.split('.tar.')[0])
                 sourcedir = os.path.join(self.teststmpdir, fio_version)
-                build.make(sourcedir)
+                key = build_cache_key(tarball, self.dist.arch)
+                if not restore_build(self.build_cache, key, sourcedir):
+                    archive.extract(tarball, self.teststmpdir)
+                    build.make(sourcedir)
+                    store_build(self.build_cache, key, sourcedir,
+                                self.build_cache_size)
                 return os.path.join(sourcedir, "fio")
         return pkg
 
@@ -105,6 +116,12 @@ class NdctlTest(Test):
         # DAX wont work with reflink, disabling here
         self.reflink = '-m reflink=0'
         self.smm = SoftwareManager()
+        self.build_cache = self.params.get(
+            'build_cache_dir', default=os.path.join(self.cache_dirs[0],
+                                                    'build_cache'))
+        self.build_cache_size = self.params.get(
+            'build_cache_size', default=4096) * 1024 * 1024
+        memo_file = os.path.join(self.teststmpdir, 'installed_packages.json')
         if self.package == 'upstream':
             deps.extend(['gcc', 'make', 'automake', 'autoconf'])
             if self.dist.name == 'SuSE':
@@ -117,10 +134,10 @@ class NdctlTest(Test):
                              'kmod-devel', 'libuuid-devel', 'json-c-devel',
                              'systemd-devel', 'keyutils-libs-devel', 'jq',
                              'parted', 'libtool'])
-            for pkg in deps:
-                if not self.smm.check_installed(pkg) and not \
-                        self.smm.install(pkg):
-                    self.cancel('%s is needed for the test to be run' % pkg)
+            missing = install_packages(self.smm, deps, memo_file)
+            if missing:
+                self.cancel('%s is needed for the test to be run'
+                            % ", ".join(missing))
 
             git_branch = self.params.get('git_branch', default='pending')
             location = "https://github.com/pmem/ndctl/archive/"
@@ -141,10 +158,10 @@ class NdctlTest(Test):
             deps.extend(['ndctl'])
             if self.dist.name == 'rhel':
                 deps.extend(['daxctl'])
-            for pkg in deps:
-                if not self.smm.check_installed(pkg) and not \
-                        self.smm.install(pkg):
-                    self.cancel('%s is needed for the test to be run' % pkg)
+            missing = install_packages(self.smm, deps, memo_file)
+            if missing:
+                self.cancel('%s is needed for the test to be run'
+                            % ", ".join(missing))
             self.ndctl = 'ndctl'
             self.daxctl = 'daxctl'
 
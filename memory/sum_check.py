@@ -16,11 +16,72 @@
 #
 
 import os
+import mmap
+import errno
+import hashlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from avocado import Test
 from avocado import main
 from avocado.utils import process, memory, disk, genio
 
 
+def _hash_mapped(view, start, end):
+    return hashlib.md5(view[start:end]).hexdigest()
+
+
+def _hash_direct(fd, start, end):
+    # O_DIRECT needs an aligned buffer, anonymous maps are page aligned,
+    # and an aligned length: the tail of the file is read padded and
+    # comes back short
+    length = end - start
+    buf = mmap.mmap(-1, -(-length // mmap.PAGESIZE) * mmap.PAGESIZE)
+    view = memoryview(buf)
+    try:
+        done = 0
+        while done < length:
+            count = os.preadv(fd, [view[done:]], start + done)
+            if not count:
+                break
+            done += count
+        return hashlib.md5(view[:min(done, length)]).hexdigest()
+    finally:
+        view.release()
+        buf.close()
+
+
+def hash_chunks(path, chunk_size, workers, direct=False):
+    """
+    Returns the md5 digest of every chunk_size bytes of path, the chunks
+    being hashed by workers threads (hashlib releases the GIL).
+
+    :param direct: read the file with O_DIRECT instead of mapping it
+    """
+    size = os.path.getsize(path)
+    ranges = [(start, min(start + chunk_size, size))
+              for start in range(0, size, chunk_size)]
+    if not ranges:
+        return []
+    if direct:
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECT)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(lambda rng: _hash_direct(fd, *rng),
+                                         ranges))
+        finally:
+            os.close(fd)
+    with open(path, 'rb') as data_file:
+        mapped = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(
+                    lambda rng: _hash_mapped(view, *rng), ranges))
+        finally:
+            view.release()
+            mapped.close()
+
+
 class SumCheck(Test):
     """
     Test allocates file chuck of RAM size and checks for md5sum of the file
@@ -34,25 +95,62 @@ class SumCheck(Test):
         self.memsize = int(self.params.get(
             'mem_size', default=memory.meminfo.MemFree.k * 0.9))
         self.ddfile = os.path.join(self.workdir, 'ddfile')
+        # chunk size in MB, a multiple of the page size for O_DIRECT reads
+        self.chunk_size = int(self.params.get('chunk_size', default=16)) << 20
+        self.workers = int(self.params.get(
+            'workers', default=multiprocessing.cpu_count()))
+        self.uncached = self.params.get('uncached', default=False)
         if (disk.freespace(self.workdir) // 1024) < self.memsize:
             self.cancel('%sM is needed for the test to be run' %
                         (self.memsize // 1024))
 
-    def test(self):
-        mdsum = []
+    def read_uncached(self):
+        """
+        Hashes the file bypassing the page cache, with O_DIRECT when the
+        filesystem allows it or after dropping the caches.
+        """
+        try:
+            return hash_chunks(self.ddfile, self.chunk_size, self.workers,
+                               direct=True)
+        except OSError as details:
+            if details.errno != errno.EINVAL:
+                raise
+        genio.write_file("/proc/sys/vm/drop_caches", "3")
+        return hash_chunks(self.ddfile, self.chunk_size, self.workers)
 
+    def test(self):
         self.log.info("Creating chunk with dd")
         try:
             process.system('dd if=/dev/urandom of=%s bs=%s count=1024' %
                            (self.ddfile, self.memsize))
         except process.CmdError as details:
             self.fail("Chunk creation failed due to %s" % details)
+        reference = None
+        corrupted = []
         for i in range(self.iter):
-            mdsum.append(process.system_output('md5sum %s' % self.ddfile))
-            self.log.info("MD5 : %s", mdsum[i])
-
-        if len(set(mdsum)) > 1:
-            self.fail('Md5sum for created file differs')
+            # alternate cached and uncached passes when asked to
+            uncached = self.uncached and i % 2
+            if uncached:
+                digests = self.read_uncached()
+            else:
+                digests = hash_chunks(self.ddfile, self.chunk_size,
+                                      self.workers)
+            self.log.info("Pass %s (%s): %s chunks of %s bytes hashed", i,
+                          'uncached' if uncached else 'cached', len(digests),
+                          self.chunk_size)
+            if reference is None:
+                reference = digests
+                continue
+            for index, (ref, digest) in enumerate(zip(reference, digests)):
+                if ref != digest:
+                    start = index * self.chunk_size
+                    corrupted.append("pass %s: bytes %s-%s differ (%s != %s)"
+                                     % (i, start, start + self.chunk_size - 1,
+                                        digest, ref))
+        if corrupted:
+            self.log.error("\n".join(corrupted))
+            self.fail('Md5sum for %s chunks of the created file differs'
+                      % len(corrupted))
 
     def tearDown(self):
         genio.write_file("/proc/sys/vm/drop_caches", "3")
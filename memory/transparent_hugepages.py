@@ -16,16 +16,19 @@
 # Author: Santhosh G <santhog4@linux.vnet.ibm.com>
 
 import os
+import sys
 from avocado import Test
 from avocado import main
-from avocado import skipIf, skipUnless
 from avocado.utils import process
 from avocado.utils import memory
 from avocado.core import data_dir
 from avocado.utils.partition import Partition
 
-
-PAGESIZE = '4096' in str(memory.get_page_size())
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.vmstat import VmSampler  # noqa
+from testlib.platform_facts import (skip_if, skip_unless,  # noqa
+                                    is_4k_pagesize, has_hugepagesize)
 
 
 class Thp(Test):
@@ -37,9 +40,8 @@ class Thp(Test):
     :avocado: tags=memory,privileged,hugepage
     '''
 
-    @skipIf(PAGESIZE, "No THP support for kernel with 4K PAGESIZE")
-    @skipUnless('Hugepagesize' in dict(memory.meminfo),
-                "Hugepagesize not defined in kernel.")
+    @skip_if(is_4k_pagesize, "No THP support for kernel with 4K PAGESIZE")
+    @skip_unless(has_hugepagesize, "Hugepagesize not defined in kernel.")
     def setUp(self):
         '''
         Sets all the reqd parameter and also
@@ -91,12 +93,26 @@ class Thp(Test):
         # Start Stresssing the  System
         self.log.info('Stress testing using dd command')
 
-        for iterator in range(self.count):
-            stress_cmd = 'dd if=/dev/zero of=%s/%d bs=%dM count=1'\
-                         % (self.mem_path, iterator, self.block_size)
-            if(process.system(stress_cmd, timeout=self.dd_timeout,
-                              verbose=False, ignore_status=True, shell=True)):
-                self.fail('dd command failed  %s' % stress_cmd)
+        sampler = VmSampler(
+            ['thp_fault_alloc', self.thp_split, 'thp_collapse_alloc'],
+            ['AnonHugePages', 'ShmemHugePages', 'MemFree'],
+            interval=self.params.get('sample_interval', default=0.1))
+        sampler.start()
+        try:
+            for iterator in range(self.count):
+                stress_cmd = 'dd if=/dev/zero of=%s/%d bs=%dM count=1'\
+                             % (self.mem_path, iterator, self.block_size)
+                if(process.system(stress_cmd, timeout=self.dd_timeout,
+                                  verbose=False, ignore_status=True,
+                                  shell=True)):
+                    self.fail('dd command failed  %s' % stress_cmd)
+        finally:
+            sampler.stop()
+            summary = sampler.save(self.outputdir)
+        self.log.info("thp_fault_alloc peak rate %.1f/s, "
+                      "first thp_collapse_alloc after %s s",
+                      summary['thp_fault_alloc']['peak_rate'],
+                      summary['thp_collapse_alloc']['first_change_secs'])
 
         # Read thp values after stressing the system
         thp_alloted_after = int(memory.read_from_vmstat("thp_fault_alloc"))
@@ -16,20 +16,72 @@
 # Author: Santhosh G <santhog4@linux.vnet.ibm.com>
 
 import os
+import sys
 import time
 import mmap
+import json
+import errno
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import avocado
 from avocado import Test
 from avocado import main
-from avocado import skipIf, skipUnless
 from avocado.utils import process
 from avocado.utils import memory
 from avocado.utils import disk
 from avocado.core import data_dir
 from avocado.utils.partition import Partition
 
-
-PAGESIZE = '4096' in str(memory.get_page_size())
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.vmstat import VmSampler  # noqa
+from testlib.platform_facts import (skip_if, skip_unless,  # noqa
+                                    is_4k_pagesize, has_hugepagesize)
+
+
+RECOVERY_COUNTERS = ['thp_collapse_alloc', 'thp_collapse_alloc_failed',
+                     'compact_stall', 'compact_success', 'compact_fail']
+
+
+def read_vmstat():
+    """
+    Returns all the /proc/vmstat counters
+    """
+    with open('/proc/vmstat') as vmstat:
+        return dict((key, int(value)) for key, value in
+                    (line.split() for line in vmstat))
+
+
+def fragment(args):
+    """
+    Fills path with files of one and two pages alternately, written from
+    one preallocated random buffer, then removes the one page files so that
+    the two page ones are interleaved with holes.
+
+    :return: number of pages left allocated
+    """
+    path, worker, pages, page_size = args
+    buf = os.urandom(2 * page_size)
+    small = []
+    used = 0
+    index = 0
+    while used < pages:
+        size = page_size if index % 2 else 2 * page_size
+        name = os.path.join(path, '%s-%s' % (worker, index))
+        try:
+            with open(name, 'wb') as frag_file:
+                frag_file.write(buf[:size])
+        except (IOError, OSError) as details:
+            if details.errno != errno.ENOSPC:
+                raise
+            break
+        if index % 2:
+            small.append(name)
+        used += size // page_size
+        index += 1
+    for name in small:
+        os.remove(name)
+    return used - len(small)
 
 
 class ThpDefrag(Test):
@@ -41,9 +93,8 @@ class ThpDefrag(Test):
     :avocado: tags=memory,privileged,hugepage
     '''
 
-    @skipIf(PAGESIZE, "No THP support for kernel with 4K PAGESIZE")
-    @skipUnless('Hugepagesize' in dict(memory.meminfo),
-                "Hugepagesize not defined in kernel.")
+    @skip_if(is_4k_pagesize, "No THP support for kernel with 4K PAGESIZE")
+    @skip_unless(has_hugepagesize, "Hugepagesize not defined in kernel.")
     def setUp(self):
         '''
         Sets required params for dd workload and mounts the tmpfs
@@ -75,14 +126,36 @@ class ThpDefrag(Test):
         # Turns off Defrag
         memory.set_thp_value("khugepaged/defrag", "0")
 
+        sampler = VmSampler(
+            RECOVERY_COUNTERS, ['MemFree', 'AnonHugePages', 'HugePages_Total'],
+            interval=self.params.get('sample_interval', default=0.1))
+        sampler.start()
+        try:
+            self.fragment_and_defrag(sampler)
+        finally:
+            sampler.stop()
+            summary = sampler.save(self.outputdir)
+        self.log.info("compact_stall peak rate %.1f/s, "
+                      "thp_collapse_alloc peak rate %.1f/s",
+                      summary['compact_stall']['peak_rate'],
+                      summary['thp_collapse_alloc']['peak_rate'])
+        self.log.info("Defrag test passed")
+
+    def fragment_and_defrag(self, sampler):
+        """
+        Fragments the memory, then checks that more hugepages can be
+        allocated once defrag is on.
+        """
         # Fragments The memory
-        self.log.info("Fragmenting the memory Using dd command \n")
-        for iterator in range(self.count):
-            defrag_cmd = 'dd if=/dev/urandom of=%s/%d bs=%dK count=1'\
-                         % (self.mem_path, iterator, self.block_size)
-            if(process.system(defrag_cmd, timeout=900,
-                              verbose=False, ignore_status=True, shell=True)):
-                self.fail('Defrag command Failed %s' % defrag_cmd)
+        workers = int(self.params.get(
+            'workers', default=min(4, multiprocessing.cpu_count())))
+        self.log.info("Fragmenting the memory with %s workers\n", workers)
+        page_size = self.block_size * 1024
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            kept = sum(executor.map(fragment, [
+                (self.mem_path, worker, self.count // workers, page_size)
+                for worker in range(workers)]))
+        self.log.info("%s pages left allocated in %s", kept, self.mem_path)
 
         hugepagesize = memory.get_huge_page_size()
         nr_full = int(0.8 * (memory.meminfo.MemTotal.k / hugepagesize))
@@ -91,13 +164,29 @@ class ThpDefrag(Test):
         nr_hp_before = self.set_max_hugepages(nr_full)
 
         # Turns Defrag ON
+        before = read_vmstat()
+        start = time.time()
         memory.set_thp_value("khugepaged/defrag", "1")
 
-        self.log.info("Sleeping %d seconds to settle out things", 10)
-        time.sleep(10)
+        settle_time = int(self.params.get('settle_time', default=10))
+        self.log.info("Waiting %d seconds to settle out things", settle_time)
+        time.sleep(settle_time)
+        first_collapse = sampler.first_change(
+            'thp_collapse_alloc', since=start - sampler.start_time)
 
         # Sets max hugepages after defrag on
         nr_hp_after = self.set_max_hugepages(nr_full)
+        after = read_vmstat()
+        recovery = dict((key, after.get(key, 0) - before.get(key, 0))
+                        for key in RECOVERY_COUNTERS)
+        recovery['first_collapse_secs'] = first_collapse
+        recovery['hugepages_before'] = nr_hp_before
+        recovery['hugepages_after'] = nr_hp_after
+        recovery['recovery_secs'] = time.time() - start
+        self.log.info("Recovery: %s", recovery)
+        with open(os.path.join(self.outputdir,
+                               'defrag_recovery.json'), 'w') as r_file:
+            json.dump(recovery, r_file, indent=1)
 
         # Check for memory defragmentation
         if nr_hp_before >= nr_hp_after:
@@ -106,8 +195,6 @@ class ThpDefrag(Test):
                      "%d After it" % (nr_hp_before, nr_hp_after)
             self.fail(e_msg)
 
-        self.log.info("Defrag test passed")
-
     @staticmethod
     def set_max_hugepages(nr_full):
         '''
@@ -17,16 +17,19 @@
 # Author: Santhosh G <santhog4@linux.vnet.ibm.com>
 
 import os
+import sys
 from avocado import Test
 from avocado import main
-from avocado import skipIf, skipUnless
 from avocado.utils import process
 from avocado.utils import memory
 from avocado.core import data_dir
 from avocado.utils.partition import Partition
 
-
-PAGESIZE = '4096' in str(memory.get_page_size())
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.vmstat import VmSampler  # noqa
+from testlib.platform_facts import (skip_if, skip_unless,  # noqa
+                                    is_4k_pagesize, has_hugepagesize)
 
 
 class ThpSwapping(Test):
@@ -37,9 +40,8 @@ class ThpSwapping(Test):
     :avocado: tags=memory,privileged,hugepage
     '''
 
-    @skipIf(PAGESIZE, "No THP support for kernel with 4K PAGESIZE")
-    @skipUnless('Hugepagesize' in dict(memory.meminfo),
-                "Hugepagesize not defined in kernel.")
+    @skip_if(is_4k_pagesize, "No THP support for kernel with 4K PAGESIZE")
+    @skip_unless(has_hugepagesize, "Hugepagesize not defined in kernel.")
     def setUp(self):
         '''
         Sets the Required params for dd and mounts the tmpfs dir
@@ -84,13 +86,26 @@ class ThpSwapping(Test):
         except Exception as details:
             self.fail("Failed  %s" % details)
 
-        for iterator in range(self.count):
-            swap_cmd = "dd if=/dev/zero of=%s/%d bs=%sM "\
-                       "count=1" % (self.mem_path, iterator,
-                                    self.hugepage_size * 2)
-            if(process.system(swap_cmd, timeout=self.dd_timeout,
-                              verbose=False, ignore_status=True, shell=True)):
-                self.fail('Swap command Failed %s' % swap_cmd)
+        sampler = VmSampler(
+            ['pswpout', 'thp_swpout', 'thp_split_page'],
+            ['SwapFree', 'MemFree', 'AnonHugePages', 'ShmemHugePages'],
+            interval=self.params.get('sample_interval', default=0.1))
+        sampler.start()
+        try:
+            for iterator in range(self.count):
+                swap_cmd = "dd if=/dev/zero of=%s/%d bs=%sM "\
+                           "count=1" % (self.mem_path, iterator,
+                                        self.hugepage_size * 2)
+                if(process.system(swap_cmd, timeout=self.dd_timeout,
+                                  verbose=False, ignore_status=True,
+                                  shell=True)):
+                    self.fail('Swap command Failed %s' % swap_cmd)
+        finally:
+            sampler.stop()
+            summary = sampler.save(self.outputdir)
+        self.log.info("pswpout peak rate %.1f/s, swapping started after %s s",
+                      summary['pswpout']['peak_rate'],
+                      summary['SwapFree']['first_change_secs'])
 
         self.swap_free.append(memory.meminfo.SwapFree.m)
 
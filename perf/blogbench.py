@@ -13,6 +13,7 @@
 # Author: Santhosh G <santhog4@linux.vnet.ibm.com>
 
 import os
+import sys
 from avocado import Test
 from avocado import main
 from avocado.utils import process
@@ -21,6 +22,10 @@ from avocado.utils import archive
 from avocado.utils.software_manager import SoftwareManager
 from avocado.core import data_dir
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.metrics import metric, emit_metrics  # noqa
+
 
 class Blogbench(Test):
 
@@ -69,6 +74,9 @@ class Blogbench(Test):
                       "%s  and %s\n " % (write_score, read_score))
         self.log.info("Please Check Logfile %s for more info of benchmark"
                       % report_path)
+        emit_metrics(self, 'blogbench', args.replace(test_dir, '').strip(),
+                     [metric('write_score', write_score, 'score'),
+                      metric('read_score', read_score, 'score')])
 
 
 if __name__ == "__main__":
@@ -19,6 +19,7 @@
 #   https://github.com/autotest/autotest-client-tests/tree/master/hackbench
 
 import os
+import sys
 import shutil
 import json
 
@@ -27,6 +28,11 @@ from avocado import main
 from avocado.utils import process
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.metrics import metric, emit_metrics  # noqa
+from testlib.repetition import RepetitionController  # noqa
+
 
 class Hackbench(Test):
 
@@ -66,20 +72,34 @@ class Hackbench(Test):
 
         hackbench_bin = os.path.join(self.workdir, 'hackbench')
         cmd = '%s %s' % (hackbench_bin, self._num_groups)
-        time_spent = 0
-        perf_json = {}
-        for run in range(self._iterations):
-            self.log.info("Iteration " + str(run+1))
+
+        def measure():
             self.results = process.system_output(cmd, shell=True).decode("utf-8")
             for line in self.results.split('\n'):
                 if line.startswith('Time:'):
-                    time_spent += float(line.split()[1])
-                    break
-        perf_json = {'time': time_spent}
-        self.whiteboard = json.dumps(perf_json)
+                    return float(line.split()[1])
+            self.fail("No Time: line found in hackbench output")
+
+        repeater = RepetitionController(
+            self.log, warmup=self.params.get('warmup_runs', default=0),
+            min_runs=self.params.get('min_runs',
+                                     default=self._iterations),
+            max_runs=self.params.get('max_runs', default=self._iterations),
+            ci_target=self.params.get('ci_target', default=5),
+            time_budget=self.params.get('time_budget', default=None))
+        stats = repeater.run(measure)
+        stats['samples'] = repeater.samples
+        with open(os.path.join(self.outputdir,
+                               'repetitions.json'), 'w') as rep_file:
+            json.dump(stats, rep_file, indent=1)
+        # the time reported and compared is the sum over all runs
+        time_spent = sum(repeater.samples)
+        emit_metrics(self, 'hackbench', 'groups=%s' % self._num_groups,
+                     [metric('time', time_spent, 's', False),
+                      metric('time_stddev', stats['stddev'], 's', False)])
         self.log.info("Time Taken:" + str(time_spent))
         if self._threshold_time:
-            if self._threshold_time <= time_spent:
+            if float(self._threshold_time) <= time_spent:
                 self.error("Test failed: Time Taken "
                            "greater or equal to threshold")
 
@@ -15,17 +15,33 @@
 # Author: Nageswara R Sastry <rnsastry@linux.vnet.ibm.com>
 
 import os
+import sys
+import json
+import hashlib
 import platform
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from avocado import Test
 from avocado import main
 from avocado.utils import cpu, distro, memory, process
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib import perf_stat  # noqa
+
 
 class hv_24x7_all_events(Test):
 
     """
     This tests all hv_24x7 events
+
+    Event specs are swept in batches of batch_size specs per perf stat
+    run, with up to workers runs in flight, each bound to its own cpu.
+    Finished batches are checkpointed, so an interrupted sweep resumes
+    where it stopped, and the per spec result matrix is written to
+    hv_24x7_matrix.csv in the test output dir.
+
     :avocado: tags=perf,24x7,events
     """
     # Initializing fail command list
@@ -100,26 +116,106 @@ class hv_24x7_all_events(Test):
             line = line.split(',')[0].split('/')[1]
             self.list_of_hv_24x7_events.append(line)
 
+        self.batch_size = int(self.params.get('batch_size', default=32))
+        self.workers = int(self.params.get('workers', default=8))
+        self.checkpoint = self.params.get(
+            'checkpoint', default=os.path.join(self.cache_dirs[0],
+                                               'hv_24x7_all_events.ckpt'))
+        self.lock = threading.Lock()
+
         # Clear the dmesg, by that we can capture the delta at the end of the test.
         process.run("dmesg -c", sudo=True)
 
+    def load_checkpoint(self, key):
+        """
+        Returns the results of an interrupted sweep with the same key and
+        opens the checkpoint for appending the results of the next batches
+        """
+        results = {}
+        if os.path.isfile(self.checkpoint):
+            with open(self.checkpoint) as checkpoint:
+                if checkpoint.readline().strip() == key:
+                    for line in checkpoint:
+                        try:
+                            results.update(json.loads(line))
+                        except ValueError:
+                            # the batch being written when interrupted
+                            continue
+        if results:
+            self.log.info("Resuming sweep, %s specs already done",
+                          len(results))
+            self.checkpoint_file = open(self.checkpoint, 'a')
+            # end the line of a batch cut short by the interruption
+            self.checkpoint_file.write("\n")
+        else:
+            self.checkpoint_file = open(self.checkpoint, 'w')
+            self.checkpoint_file.write("%s\n" % key)
+            self.checkpoint_file.flush()
+        return results
+
+    def sweep(self, cpu_id, batches, results):
+        for batch in batches:
+            samples, failed = perf_stat.run_batch(batch, "-C %s" % cpu_id)
+            status = dict((spec, values[0][0])
+                          for (spec, _), values in samples.items())
+            status.update((spec, '<failed>') for spec in failed)
+            # one line per batch, appending does not rewrite earlier ones
+            line = "%s\n" % json.dumps(status)
+            with self.lock:
+                results.update(status)
+                self.checkpoint_file.write(line)
+                self.checkpoint_file.flush()
+
     def test_all_events(self):
-        perf_args = "-C 9 -v -e"
+        specs = []
         for line in self.list_of_hv_24x7_events:
             if line.startswith('HP') or line.startswith('CP'):
                 # Running for domain range from 1-6
                 for domain in range(1, 7):
                     for core in range(0, self.cores + 1):
-                        events = "hv_24x7/%s,domain=%s,core=%s/" % (line, domain, core)
-                        cmd = 'perf stat %s %s sleep 1' % (perf_args, events)
-                        if process.system(cmd, ignore_status=True):
-                            self.fail_cmd.append(cmd)
+                        specs.append((line, domain, core, ''))
             else:
                 for chip_item in self.chip:
-                    events = "hv_24x7/%s,chip=%s/" % (line, chip_item)
-                    cmd = "perf stat %s %s sleep 1" % (perf_args, events)
-                    if process.system(cmd, ignore_status=True):
-                        self.fail_cmd.append(cmd)
+                    specs.append((line, '', '', chip_item))
+        events = {}
+        for event, domain, core, chip_item in specs:
+            if chip_item != '':
+                spec = "hv_24x7/%s,chip=%s/" % (event, chip_item)
+            else:
+                spec = "hv_24x7/%s,domain=%s,core=%s/" % (event, domain, core)
+            events[spec] = (event, domain, core, chip_item)
+
+        # a sweep only resumes from results of the same kernel, specs,
+        # batch size and cores and chips
+        key = hashlib.sha256(json.dumps(
+            [platform.uname()[2], sorted(events), self.batch_size,
+             self.cores, self.chip]).encode()).hexdigest()
+        results = self.load_checkpoint(key)
+        todo = [spec for spec in events if spec not in results]
+        batches = [todo[i:i + self.batch_size]
+                   for i in range(0, len(todo), self.batch_size)]
+        cpus = cpu.cpu_online_list()[:self.workers]
+        self.log.info("Sweeping %s hv_24x7 specs in %s batches on cpus %s",
+                      len(todo), len(batches), cpus)
+        with ThreadPoolExecutor(max_workers=len(cpus)) as executor:
+            sweeps = [executor.submit(self.sweep, cpu_id,
+                                      batches[index::len(cpus)], results)
+                      for index, cpu_id in enumerate(cpus)]
+        self.checkpoint_file.close()
+        for job in sweeps:
+            job.result()
+
+        with open(os.path.join(self.outputdir,
+                               'hv_24x7_matrix.csv'), 'w') as matrix:
+            matrix.write("event,domain,core,chip,result\n")
+            for spec, fields in events.items():
+                status = results.get(spec, '<not run>')
+                matrix.write("%s,%s,%s,%s,%s\n" % (fields + (status,)))
+                if status.startswith('<'):
+                    self.fail_cmd.append("perf stat -e %s sleep 1 (%s)"
+                                         % (spec, status))
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
 
         if len(self.fail_cmd) > 0:
             for cmd in range(len(self.fail_cmd)):
@@ -14,12 +14,22 @@
 # Copyright: 2019 IBM
 # Author: Nageswara R Sastry <rnsastry@linux.vnet.ibm.com>
 
+import os
+import sys
 import platform
 from avocado import Test
 from avocado import main
 from avocado.utils import distro, process
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.kmsg import KmsgMonitor  # noqa
+
+
+DMESG_PATTERNS = ['WARNING: CPU:', 'Oops',
+                  'Segfault', 'soft lockup', 'Unable to handle']
+
 
 class perf_bench(Test):
 
@@ -33,6 +43,7 @@ class perf_bench(Test):
         Install the basic packages to support perf
         '''
 
+        self.kmsg = None
         # Check for basic utilities
         smm = SoftwareManager()
         detected_distro = distro.detect()
@@ -55,16 +66,16 @@ class perf_bench(Test):
         self.optname = self.params.get('name', default='all')
         self.option = self.params.get('option', default='')
 
-        # Clear the dmesg, by that we can capture the delta at the end of the test.
-        process.run("dmesg -C", sudo=True)
+        # Follow the kernel log, by that we can capture the delta at the
+        # end of the test without clearing the ring buffer.
+        self.kmsg = KmsgMonitor(DMESG_PATTERNS)
+        self.kmsg.start()
 
     def verify_dmesg(self):
-        self.whiteboard = process.system_output("dmesg").decode("utf-8")
-        pattern = ['WARNING: CPU:', 'Oops',
-                   'Segfault', 'soft lockup', 'Unable to handle']
-        for fail_pattern in pattern:
-            if fail_pattern in self.whiteboard:
-                self.fail("Test Failed : %s in dmesg" % fail_pattern)
+        errors = self.kmsg.new_errors()
+        self.whiteboard = "\n".join(self.kmsg.records)
+        if errors:
+            self.fail("Test Failed : %s in dmesg" % errors[0])
 
     def run_cmd(self, cmd):
         try:
@@ -78,6 +89,10 @@ class perf_bench(Test):
         self.run_cmd(bench_cmd)
         self.verify_dmesg()
 
+    def tearDown(self):
+        if self.kmsg:
+            self.kmsg.stop()
+
 
 if __name__ == "__main__":
     main()
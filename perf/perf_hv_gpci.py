@@ -14,17 +14,29 @@
 # Copyright: 2019 IBM
 # Author: Nageswara R Sastry <rnsastry@linux.vnet.ibm.com>
 
+import os
+import sys
 import platform
 from avocado import Test
 from avocado import main
 from avocado.utils import cpu, distro, process
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib import perf_stat  # noqa
+
 
 class perf_hv_gpci(Test):
 
     """
     Tests hv_gpci events
+
+    All events are counted on cpu 1, per core and per socket in
+    multiplexed runs of batch_size events, sampled every `interval`
+    msecs, and the counts and running ratios are written to
+    hv_gpci_events.csv in the output dir.
+
     :avocado: tags=perf,hv_gpci,events
     """
     # Initializing fail command list
@@ -65,6 +77,11 @@ class perf_hv_gpci(Test):
             line = line.split(',')[0].split('/')[1]
             self.list_of_hv_gpci_events.append(line)
 
+        self.batch_size = int(self.params.get('batch_size', default=32))
+        self.interval = int(self.params.get('interval', default=250))
+        self.require_nonzero = self.params.get('require_nonzero',
+                                               default=False)
+
         # Clear the dmesg, by that we can capture the delta at the end of the test.
         output = process.run("dmesg -c")
 
@@ -74,23 +91,17 @@ class perf_hv_gpci(Test):
                 self.log.info("Failed command: %s" % self.fail_cmd[cmd])
             self.fail("perf_raw_events: some of the events failed, refer to log")
 
-    def run_cmd(self, cmd):
-        output = process.run(cmd, shell=True, ignore_status=True)
-        if output.exit_status != 0:
-            self.fail_cmd.append(cmd)
-
     def test_gpci_events(self):
-        perf_stat = "perf stat"
-        perf_flags = '-C 1 -v -e'
-
-        for line in self.list_of_hv_gpci_events:
-            evt = "hv_gpci/%s,hw_chip_id=12/" % line
-            cmd = "%s %s %s sleep 1" % (perf_stat, perf_flags, evt)
-            self.run_cmd(cmd)
-            cmd = "%s --per-core -a -e %s sleep 1" % (perf_stat, evt)
-            self.run_cmd(cmd)
-            cmd = "%s --per-socket -a -e %s sleep 1" % (perf_stat, evt)
-            self.run_cmd(cmd)
+        events = ["hv_gpci/%s,hw_chip_id=12/" % line
+                  for line in self.list_of_hv_gpci_events]
+        samples, failed = perf_stat.count_modes(
+            events, [('cpu1', '-C 1'), ('per-core', '--per-core -a'),
+                     ('per-socket', '--per-socket -a')],
+            self.batch_size, self.interval)
+        self.fail_cmd.extend(failed)
+        self.fail_cmd.extend(perf_stat.check_counters(
+            samples, os.path.join(self.outputdir, 'hv_gpci_events.csv'),
+            self.require_nonzero, self.log))
 
         self.error_check()
 
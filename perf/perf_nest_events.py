@@ -14,12 +14,18 @@
 # Copyright: 2019 IBM
 # Author: Nageswara R Sastry <rnsastry@linux.vnet.ibm.com>
 
+import os
+import sys
 import platform
 from avocado import Test
 from avocado import main
 from avocado.utils import cpu, distro, genio, process
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib import perf_stat  # noqa
+
 
 class nestEvents(Test):
 
@@ -27,6 +33,10 @@ class nestEvents(Test):
     Tests nest events
     Collects all the available events from 'perf list' and
     executes them using 'perf stat' command
+
+    All events are counted system wide in multiplexed runs of batch_size
+    events, sampled every `interval` msecs, and the per cpu counts and
+    running ratios are written to nest_events.csv in the output dir.
     :avocado: tags=perf,nest,events
     """
     # Initializing fail command list
@@ -73,6 +83,11 @@ class nestEvents(Test):
                 continue
             self.list_of_nest_events.append(line)
 
+        self.batch_size = int(self.params.get('batch_size', default=32))
+        self.interval = int(self.params.get('interval', default=250))
+        self.require_nonzero = self.params.get('require_nonzero',
+                                               default=False)
+
         # Clear the dmesg, by that we can capture the delta at the end of the test.
         process.run("dmesg -c", sudo=True)
 
@@ -82,17 +97,14 @@ class nestEvents(Test):
                 self.log.info("Failed command: %s" % self.fail_cmd[cmd])
             self.fail("perf_raw_events: some of the events failed, refer to log")
 
-    def run_cmd(self, cmd):
-        if process.system(cmd, shell=True, ignore_status=True):
-            self.fail_cmd.append(cmd)
-
     def test_nest_events(self):
-        perf_stat = "perf stat -e"
-        perf_flags = '-a -A sleep 1'
-
-        for line in self.list_of_nest_events:
-            cmd = "%s %s %s" % (perf_stat, line, perf_flags)
-            self.run_cmd(cmd)
+        samples, failed = perf_stat.count_modes(
+            self.list_of_nest_events, [('per-cpu', '-a -A')],
+            self.batch_size, self.interval)
+        self.fail_cmd.extend(failed)
+        self.fail_cmd.extend(perf_stat.check_counters(
+            samples, os.path.join(self.outputdir, 'nest_events.csv'),
+            self.require_nonzero, self.log))
 
         self.error_check()
 
@@ -15,6 +15,7 @@
 # Author: Nageswara R Sastry <rnsastry@linux.vnet.ibm.com>
 
 import os
+import sys
 import platform
 import shutil
 from avocado import Test
@@ -23,6 +24,10 @@ from avocado import skipUnless
 from avocado.utils import cpu, distro, process, genio
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib import perf_stat  # noqa
+
 CPU_ARCH = cpu.get_cpu_arch().lower()
 IS_POWER9 = 'power9' in CPU_ARCH
 IS_POWER8 = 'power8' in CPU_ARCH
@@ -33,6 +38,12 @@ class PerfRawevents(Test):
     """
     Tests raw events on Power8 and Power9 along with
     named events
+
+    :param batch_size: events validated by a single perf stat run,
+                       1 runs every event on its own
+    :param group_size: events per {} group within a batch, 0 to let perf
+                       multiplex the whole batch
+
     :avocado: tags=perf,rawevents,events
     """
     # Initializing fail command list
@@ -72,21 +83,40 @@ class PerfRawevents(Test):
         for filename in ['name_events_p8', 'raw_codes_p8', 'raw_codes_p9']:
             self.copy_files(filename)
 
+        self.batch_size = int(self.params.get('batch_size', default=64))
+        self.group_size = int(self.params.get('group_size', default=0))
         os.chdir(self.teststmpdir)
         # Clear the dmesg, by that we can capture the delta at the end of the test.
         process.run("dmesg -c")
 
+    def run_batch(self, events):
+        """
+        Counts the events with one perf stat run, see perf_stat.run_batch,
+        and records the ones which failed or were not supported.
+        """
+        samples, failed = perf_stat.run_batch(events, "", None,
+                                              self.group_size)
+        for event in failed:
+            self.fail_cmd.append("perf stat -e %s sleep 1" % event)
+        for (event, _), values in sorted(samples.items()):
+            status = perf_stat.counter_status(values)
+            if status == '<not counted>' and len(events) > 1:
+                # the event may just not have been scheduled next to the
+                # rest of the batch, it has to count on its own
+                self.run_batch([event])
+            elif status.startswith('<'):
+                self.fail_cmd.append("perf stat -e %s sleep 1 (%s)"
+                                     % (event, status))
+
     def run_event(self, filename, eventname):
         if eventname == 'raw':
-            perf_flags = "perf stat -e r"
+            prefix = "r"
         elif eventname == 'name':
-            perf_flags = "perf stat -e "
-        for line in genio.read_all_lines(filename):
-            cmd = "%s%s sleep 1" % (perf_flags, line)
-            output = process.run(cmd, shell=True,
-                                 ignore_status=True)
-            if output.exit_status != 0:
-                self.fail_cmd.append(cmd)
+            prefix = ""
+        events = ["%s%s" % (prefix, line.strip())
+                  for line in genio.read_all_lines(filename) if line.strip()]
+        for index in range(0, len(events), self.batch_size):
+            self.run_batch(events[index:index + self.batch_size])
 
     def error_check(self):
         if self.fail_cmd:
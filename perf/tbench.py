@@ -19,6 +19,8 @@
 # https://github.com/autotest/autotest-client-tests/tree/master/tbench
 
 import os
+import sys
+import json
 import signal
 import subprocess
 import re
@@ -29,6 +31,11 @@ from avocado.utils import process
 from avocado.utils import build
 from avocado.utils.software_manager import SoftwareManager
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.metrics import metric, emit_metrics  # noqa
+from testlib.repetition import RepetitionController  # noqa
+
 
 class tbench(Test):
 
@@ -61,23 +68,47 @@ class tbench(Test):
         # only supports combined server+client model at the moment
         # should support separate I suppose, but nobody uses it
         nprocs = self.params.get('nprocs', default=subprocess.getoutput("nproc"))
-        args = self.params.get('args',  default=None)
+        args = self.params.get('args',  default='')
         args = '%s %s' % (args, nprocs)
+        variant = args.strip()
         pid = os.fork()
         if pid:                         # parent
             client = os.path.join(self.sourcedir, 'client.txt')
             args = '-c %s %s' % (client, args)
             cmd = os.path.join(self.sourcedir, "tbench") + " " + args
-            # Standard output is verbose and merely makes our debug logs huge
-            # so we don't retain it.  It gets parsed for the results.
-            self.results = process.system_output(cmd, shell=True).decode()
-            os.kill(pid, signal.SIGTERM)    # clean up the server
+            pattern = re.compile(r"Throughput (.*?) MB/sec (.*?) procs")
+
+            def measure():
+                # Standard output is verbose and merely makes our debug logs
+                # huge so we don't retain it.  It gets parsed for the results.
+                self.results = process.system_output(cmd,
+                                                     shell=True).decode()
+                (throughput, procs) = pattern.findall(self.results)[0]
+                self.log.info({'throughput': throughput, 'procs': procs})
+                return float(throughput)
+
+            repeater = RepetitionController(
+                self.log, warmup=self.params.get('warmup_runs', default=0),
+                min_runs=self.params.get('min_runs', default=1),
+                max_runs=self.params.get('max_runs', default=1),
+                ci_target=self.params.get('ci_target', default=5),
+                time_budget=self.params.get('time_budget', default=None))
+            try:
+                stats = repeater.run(measure)
+            finally:
+                os.kill(pid, signal.SIGTERM)    # clean up the server
         else:                           # child
             server = os.path.join(self.sourcedir, 'tbench_srv')
             os.execlp(server, server)
-        pattern = re.compile(r"Throughput (.*?) MB/sec (.*?) procs")
-        (throughput, procs) = pattern.findall(self.results)[0]
-        self.log.info({'throughput': throughput, 'procs': procs})
+        stats['samples'] = repeater.samples
+        with open(os.path.join(self.outputdir,
+                               'repetitions.json'), 'w') as rep_file:
+            json.dump(stats, rep_file, indent=1)
+        emit_metrics(self, 'tbench', variant,
+                     [metric('throughput', stats['mean'], 'MB/s'),
+                      metric('throughput_stddev', stats['stddev'], 'MB/s',
+                             False),
+                      metric('procs', nprocs, 'procs')])
 
 
 if __name__ == "__main__":
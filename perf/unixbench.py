@@ -18,6 +18,7 @@
 # copyright : 2008 Google
 
 import os
+import sys
 import re
 from avocado import Test
 from avocado.utils import process
@@ -26,6 +27,10 @@ from avocado.utils import archive
 from avocado.utils.software_manager import SoftwareManager
 from avocado.core import data_dir
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.metrics import metric, emit_metrics  # noqa
+
 
 class Unixbench(Test):
 
@@ -57,6 +62,7 @@ class Unixbench(Test):
                        sudo=True, ignore_status=True)
         report_path = os.path.join(self.logdir, 'stdout')
         self.report_data = open(report_path).readlines()
+        self.parse_report(args)
 
     def check_for_failure(self, words):
         length = len(words)
@@ -71,9 +77,10 @@ class Unixbench(Test):
         else:
             return False
 
-    def tearDown(self):
+    def parse_report(self, args):
         self.err = None
         keyval = {}
+        metrics = []
         parse_flag = False
         result_flag = False
         for line in self.report_data:
@@ -96,13 +103,20 @@ class Unixbench(Test):
                     key = re.sub(r'\W', '', key)
                     value = words[-6]
                     keyval[key] = value
+                    try:
+                        metrics.append(metric(key, value, words[-5]))
+                    except ValueError:
+                        self.log.warn("Ignoring non numeric result %s", line)
             else:
                 continue
         for line in self.report_data:
             if 'System Benchmarks Index Score' in line:
                 keyval['score'] = line.split()[-1]
+                metrics.append(metric('score', keyval['score'], 'index'))
                 break
 
+        if metrics:
+            emit_metrics(self, 'unixbench', args, metrics)
         if self.err is not None:
             self.fail('Test failure  Has been Occured \n %s' % self.err)
         else:
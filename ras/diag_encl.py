@@ -15,15 +15,18 @@
 # Author: Pavithra <pavrampu@linux.vnet.ibm.com>
 
 import os
+import sys
 import glob
 import xml.etree.ElementTree
-from avocado import Test, skipIf
+from avocado import Test
 from avocado import main
 from avocado.utils import process, distro
 from avocado.utils import genio
 from avocado.utils.software_manager import SoftwareManager
 
-IS_KVM_GUEST = 'qemu' in open('/proc/cpuinfo', 'r').read()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.platform_facts import skip_if, is_kvm_guest, is_power_nv  # noqa
 
 
 class DiagEncl(Test):
@@ -45,7 +48,8 @@ class DiagEncl(Test):
                                      ignore_status=True,
                                      sudo=True).decode("utf-8")
 
-    @skipIf(IS_KVM_GUEST, "This test is not supported on KVM guest platform")
+    @skip_if(is_kvm_guest, "This test is not supported on KVM guest "
+             "platform")
     def setUp(self):
         if "ppc" not in distro.detect().arch:
             self.cancel("supported only on Power platform")
@@ -82,7 +86,7 @@ class DiagEncl(Test):
             product_path = '/proc/device-tree/model'
             serial_path = '/proc/device-tree/system-id'
         product_name = genio.read_one_line(product_path).rstrip(' \t\r\n\0')
-        if 'PowerNV' not in open('/proc/cpuinfo', 'r').read():
+        if not is_power_nv():
             product_name = product_name.split(',')[1]
         serial_num = genio.read_one_line(serial_path).rstrip(' \t\r\n\0')
         product_name_xml = "-".join((machine_type, machine_model))
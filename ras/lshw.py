@@ -13,14 +13,25 @@
 # Copyright: 2016 IBM.
 # Author: Ramya BS <ramya@linux.vnet.ibm.com>
 
+import os
+import sys
+
 from avocado import Test
 from avocado import main
-from avocado import skipIf
 from avocado.utils import process
 from avocado.utils import genio
 from avocado.utils.software_manager import SoftwareManager
 from avocado.utils import distro
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.platform_facts import skip_if, active_interface  # noqa
+
+
+def notime_unsupported():
+    return process.system("lshw --help 2>&1 |grep notime",
+                          ignore_status=True, sudo=True, shell=True) == 1
+
 
 class Lshwrun(Test):
 
@@ -34,11 +45,6 @@ class Lshwrun(Test):
 
     :avocado: tags=privileged
     """
-    interface = process.system_output("ip route show")
-    active_interface = process.system_output(
-        "ip link ls up  | awk -F: '$0 !~ \"lo|vir|^[^0-9]\"{print $2}'"
-        " | cut -d  \" \" -f2 | head -1",
-        shell=True).decode("utf-8").strip().split()[0]
     fail_cmd = list()
 
     def run_cmd(self, cmd):
@@ -127,7 +133,7 @@ class Lshwrun(Test):
             self.fail("lshw failed to show correct mac address")
 
         # verify network
-        if self.active_interface not in self.run_cmd_out("lshw -class network"):
+        if active_interface() not in self.run_cmd_out("lshw -class network"):
             self.fail("lshw failed to show correct active network interface")
 
     def test_gen_rep(self):
@@ -219,9 +225,7 @@ class Lshwrun(Test):
                     "lshw -numeric | grep HCI | cut -d':' -f3")
         self.error_check()
 
-    @skipIf(process.system("lshw --help 2>&1 |grep notime",
-                           ignore_status=True, sudo=True, shell=True) == 1,
-            "-notime option unsupported, skipping")
+    @skip_if(notime_unsupported, "-notime option unsupported, skipping")
     def test_lshw_notime(self):
         """
         -notime -> exclude volatile attributes (timestamps) from output.
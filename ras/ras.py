@@ -15,14 +15,17 @@
 # Author: Pavithra <pavrampu@linux.vnet.ibm.com>
 
 import os
+import sys
 from shutil import copyfile
 from avocado import Test
-from avocado.utils import process, distro
-from avocado import skipIf, skipUnless
+from avocado.utils import process
 from avocado.utils.software_manager import SoftwareManager
 
-IS_POWER_NV = 'PowerNV' in open('/proc/cpuinfo', 'r').read()
-IS_KVM_GUEST = 'qemu' in open('/proc/cpuinfo', 'r').read()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.platform_facts import (skip_if, skip_unless, is_ppc,  # noqa
+                                     is_power_nv, is_kvm_guest,
+                                     is_nv_or_kvm_guest)
 
 
 class RASTools(Test):
@@ -45,8 +48,8 @@ class RASTools(Test):
                 self.log.info("Failed command: %s" % self.fail_cmd[cmd])
             self.fail("RAS: Failed commands are: %s" % self.fail_cmd)
 
-    @skipUnless("ppc" in distro.detect().arch,
-                "supported only on Power platform")
+    @skip_unless(is_ppc,
+                 "supported only on Power platform")
     def setUp(self):
         sm = SoftwareManager()
         for package in ("ppc64-diag", "powerpc-utils", "lsvpd", "ipmitool"):
@@ -60,7 +63,8 @@ class RASTools(Test):
                                      ignore_status=True,
                                      sudo=True).decode("utf-8").strip()
 
-    @skipIf(IS_POWER_NV or IS_KVM_GUEST, "This test is not supported on KVM guest or PowerNV platform")
+    @skip_if(is_nv_or_kvm_guest, "This test is not supported on KVM "
+             "guest or PowerNV platform")
     def test1_set_poweron_time(self):
         """
         set_poweron_time schedules the power on time
@@ -73,7 +77,8 @@ class RASTools(Test):
         self.run_cmd("set_poweron_time -t M6D15h12")
         self.error_check()
 
-    @skipIf(IS_POWER_NV or IS_KVM_GUEST, "This test is not supported on KVM guest or PowerNV platform")
+    @skip_if(is_nv_or_kvm_guest, "This test is not supported on KVM "
+             "guest or PowerNV platform")
     def test2_sys_ident_tool(self):
         """
         sys_ident provides unique system identification information
@@ -107,7 +112,7 @@ class RASTools(Test):
             self.run_cmd("lsmcode --zip=%s" % path_tar)
         self.error_check()
 
-    @skipIf(IS_POWER_NV, "Skipping test in PowerNV platform")
+    @skip_if(is_power_nv, "Skipping test in PowerNV platform")
     def test4_drmgr(self):
         """
         drmgr can be used for pci, cpu or memory hotplug
@@ -137,7 +142,7 @@ class RASTools(Test):
         self.run_cmd("lsprop")
         self.error_check()
 
-    @skipIf(IS_POWER_NV, "Skipping test in PowerNV platform")
+    @skip_if(is_power_nv, "Skipping test in PowerNV platform")
     def test6_lsslot(self):
         """
         lsslot lists the slots based on the option provided
@@ -147,7 +152,7 @@ class RASTools(Test):
         self.run_cmd("lsslot")
         self.run_cmd("lsslot -c mem")
         self.run_cmd("lsslot -ac pci")
-        if not IS_KVM_GUEST:
+        if not is_kvm_guest():
             self.run_cmd("lsslot -c cpu -b")
         self.run_cmd("lsslot -c pci -o")
         slot = self.run_cmd_out("lsslot | cut -d' ' -f1 | head -2"
@@ -156,7 +161,7 @@ class RASTools(Test):
             self.run_cmd("lsslot -s %s" % slot)
         self.error_check()
 
-    @skipIf(IS_POWER_NV, "Skipping test in PowerNV platform")
+    @skip_if(is_power_nv, "Skipping test in PowerNV platform")
     def test7_lsvio(self):
         """
         lsvio lists the virtual I/O adopters and devices
@@ -182,7 +187,7 @@ class RASTools(Test):
         self.run_cmd("nvram --dump common --verbose")
         self.error_check()
 
-    @skipIf(IS_POWER_NV, "Skipping test in PowerNV platform")
+    @skip_if(is_power_nv, "Skipping test in PowerNV platform")
     def test9_ofpathname(self):
         """
         ofpathname translates the device name between logical name and Open
@@ -204,7 +209,8 @@ class RASTools(Test):
             self.run_cmd("ofpathname -l %s" % of_name)
         self.error_check()
 
-    @skipIf(IS_POWER_NV or IS_KVM_GUEST, "This test is not supported on KVM guest or PowerNV platform")
+    @skip_if(is_nv_or_kvm_guest, "This test is not supported on KVM "
+             "guest or PowerNV platform")
     def test11_rtas_ibm_get_vpd(self):
         """
         rtas_ibm_get_vpd gives vpd data
@@ -215,7 +221,7 @@ class RASTools(Test):
         self.run_cmd("rtas_ibm_get_vpd >> %s 2>&1" % output_file)
         self.error_check()
 
-    @skipIf(IS_POWER_NV, "Skipping test in PowerNV platform")
+    @skip_if(is_power_nv, "Skipping test in PowerNV platform")
     def test12_rtas_errd_and_rtas_dump(self):
         """
         rtas_errd adds RTAS events to /var/log/platform and rtas_dump dumps
@@ -245,7 +251,8 @@ class RASTools(Test):
         self.run_cmd("rtas_dump -f %s -w 20" % rtas_file)
         self.error_check()
 
-    @skipIf(IS_POWER_NV, "This test is not supported on PowerNV platform")
+    @skip_if(is_power_nv, "This test is not supported on PowerNV "
+             "platform")
     def test13_rtas_event_decode(self):
         self.log.info("===============Executing rtas_event_decode tool test===="
                       "===========")
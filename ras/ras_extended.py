@@ -15,15 +15,17 @@
 # Author: Pavithra <pavrampu@linux.vnet.ibm.com>
 
 import os
+import sys
 import shutil
 from avocado import Test
 from avocado import main
 from avocado.utils import process, distro
-from avocado import skipIf
 from avocado.utils.software_manager import SoftwareManager
 
-IS_POWER_NV = 'PowerNV' in open('/proc/cpuinfo', 'r').read()
-IS_KVM_GUEST = 'qemu' in open('/proc/cpuinfo', 'r').read()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from testlib.platform_facts import (skip_if, is_kvm_guest,  # noqa
+                                     is_nv_or_kvm_guest)
 
 
 class RASTools(Test):
@@ -53,7 +55,8 @@ class RASTools(Test):
                                      ignore_status=True,
                                      sudo=True).decode("utf-8").strip()
 
-    @skipIf(IS_POWER_NV or IS_KVM_GUEST, "This test is not supported on KVM guest or PowerNV platform")
+    @skip_if(is_nv_or_kvm_guest, "This test is not supported on KVM "
+             "guest or PowerNV platform")
     def test1_uesensor(self):
         self.log.info("===============Executing uesensor tool test===="
                       "===========")
@@ -63,7 +66,8 @@ class RASTools(Test):
             self.fail("%s command(s) failed in uesensor tool "
                       "verification" % self.is_fail)
 
-    @skipIf(IS_POWER_NV or IS_KVM_GUEST, "This test is not supported on KVM guest or PowerNV platform")
+    @skip_if(is_nv_or_kvm_guest, "This test is not supported on KVM "
+             "guest or PowerNV platform")
     def test1_serv_config(self):
         self.log.info("===============Executing serv_config tool test===="
                       "===========")
@@ -77,7 +81,8 @@ class RASTools(Test):
             self.fail("%s command(s) failed in serv_config tool "
                       "verification" % self.is_fail)
 
-    @skipIf(IS_POWER_NV or IS_KVM_GUEST, "This test is not supported on KVM guest or PowerNV platform")
+    @skip_if(is_nv_or_kvm_guest, "This test is not supported on KVM "
+             "guest or PowerNV platform")
     def test1_ls_vscsi(self):
         self.log.info("===============Executing ls-vscsi tool test===="
                       "===========")
@@ -88,7 +93,8 @@ class RASTools(Test):
             self.fail("%s command(s) failed in ls-vscsi tool "
                       "verification" % self.is_fail)
 
-    @skipIf(IS_POWER_NV or IS_KVM_GUEST, "This test is not supported on KVM guest or PowerNV platform")
+    @skip_if(is_nv_or_kvm_guest, "This test is not supported on KVM "
+             "guest or PowerNV platform")
     def test1_ls_veth(self):
         self.log.info("===============Executing ls-veth tool test===="
                       "===========")
@@ -99,7 +105,8 @@ class RASTools(Test):
             self.fail("%s command(s) failed in ls-veth tool "
                       "verification" % self.is_fail)
 
-    @skipIf(IS_POWER_NV or IS_KVM_GUEST, "This test is not supported on KVM guest or PowerNV platform")
+    @skip_if(is_nv_or_kvm_guest, "This test is not supported on KVM "
+             "guest or PowerNV platform")
     def test1_ls_vdev(self):
         self.log.info("===============Executing ls-vdev tool test===="
                       "===========")
@@ -110,7 +117,8 @@ class RASTools(Test):
             self.fail("%s command(s) failed in ls-vdev tool "
                       "verification" % self.is_fail)
 
-    @skipIf(IS_POWER_NV or IS_KVM_GUEST, "This test is not supported on KVM guest or PowerNV platform")
+    @skip_if(is_nv_or_kvm_guest, "This test is not supported on KVM "
+             "guest or PowerNV platform")
     def test1_lsdevinfo(self):
         self.log.info("===============Executing lsdevinfo tool test===="
                       "===========")
@@ -129,7 +137,8 @@ class RASTools(Test):
             self.fail("%s command(s) failed in lsdevinfo tool "
                       "verification" % self.is_fail)
 
-    @skipIf(IS_POWER_NV or IS_KVM_GUEST, "This test is not supported on KVM guest or PowerNV platform")
+    @skip_if(is_nv_or_kvm_guest, "This test is not supported on KVM "
+             "guest or PowerNV platform")
     def test1_hvcsadmin(self):
         self.log.info("===============Executing hvcsadmin tool test===="
                       "===========")
@@ -141,7 +150,8 @@ class RASTools(Test):
             self.fail("%s command(s) failed in hvcsadmin tool "
                       "verification" % self.is_fail)
 
-    @skipIf(IS_POWER_NV or IS_KVM_GUEST, "This test is not supported on KVM guest or PowerNV platform")
+    @skip_if(is_nv_or_kvm_guest, "This test is not supported on KVM "
+             "guest or PowerNV platform")
     def test1_bootlist(self):
         self.log.info("===============Executing bootlist tool test===="
                       "===========")
@@ -164,7 +174,8 @@ class RASTools(Test):
             self.fail("%s command(s) failed in bootlist tool "
                       "verification" % self.is_fail)
 
-    @skipIf(IS_KVM_GUEST, "This test is not supported on KVM guest platform")
+    @skip_if(is_kvm_guest, "This test is not supported on KVM guest "
+             "platform")
     def test1_vpdupdate(self):
         self.log.info("===============Executing vpdupdate tool test===="
                       "===========")
@@ -199,7 +210,8 @@ class RASTools(Test):
             self.fail("%s command(s) failed in vpdupdate tool "
                       "verification" % self.is_fail)
 
-    @skipIf(IS_KVM_GUEST, "This test is not supported on KVM guest platform")
+    @skip_if(is_kvm_guest, "This test is not supported on KVM guest "
+             "platform")
     def test3_lsvpd(self):
         self.log.info("===============Executing lsvpd tool test============="
                       "==")
@@ -224,7 +236,8 @@ class RASTools(Test):
             self.fail("%s command(s) failed in lsvpd tool verification"
                       % self.is_fail)
 
-    @skipIf(IS_KVM_GUEST, "This test is not supported on KVM guest platform")
+    @skip_if(is_kvm_guest, "This test is not supported on KVM guest "
+             "platform")
     def test3_lscfg(self):
         self.log.info("===============Executing lscfg tool test============="
                       "==")
@@ -0,0 +1,88 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See LICENSE for more details.
+#
+# Copyright: 2020 IBM
+
+"""
+Cache of built tool trees, shared across test variants and jobs
+"""
+
+import os
+import shutil
+import hashlib
+
+
+def build_cache_key(tarball, *inputs):
+    """
+    Returns a key identifying a build of tarball with the given inputs
+    (patches, arch, make arguments)
+    """
+    digest = hashlib.sha256()
+    with open(tarball, 'rb') as tar_file:
+        for chunk in iter(lambda: tar_file.read(1 << 20), b''):
+            digest.update(chunk)
+    for item in inputs:
+        digest.update(repr(item).encode())
+    return digest.hexdigest()
+
+
+def restore_build(cache_dir, key, dest):
+    """
+    Copies the cached build tree for key to dest, returns False on a miss
+    """
+    if not cache_dir:
+        return False
+    entry = os.path.join(cache_dir, key)
+    if not os.path.isdir(entry):
+        return False
+    if os.path.exists(dest):
+        shutil.rmtree(dest)
+    shutil.copytree(entry, dest, symlinks=True)
+    # mtime of the entry is the LRU timestamp
+    os.utime(entry, None)
+    return True
+
+
+def store_build(cache_dir, key, src, max_size):
+    """
+    Stores the built tree src under key and evicts the least recently used
+    entries until the cache is below max_size bytes
+    """
+    if not cache_dir:
+        return
+    entry = os.path.join(cache_dir, key)
+    tmp_entry = "%s.%d.tmp" % (entry, os.getpid())
+    if os.path.isdir(entry):
+        return
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    shutil.copytree(src, tmp_entry, symlinks=True)
+    try:
+        os.rename(tmp_entry, entry)
+    except OSError:
+        # a concurrent job stored the same build first
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.endswith('.tmp') or not os.path.isdir(path):
+            continue
+        size = 0
+        for root, _, files in os.walk(path):
+            size += sum(os.lstat(os.path.join(root, fname)).st_size
+                        for fname in files)
+        entries.append((os.path.getmtime(path), size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_size or path == entry:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
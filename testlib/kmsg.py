@@ -0,0 +1,84 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See LICENSE for more details.
+#
+# Copyright: 2020 IBM
+
+"""
+Kernel log monitoring
+"""
+
+import os
+import re
+import select
+import threading
+
+
+class KmsgMonitor(threading.Thread):
+
+    """
+    Follows /dev/kmsg from the end of the ring buffer in the background,
+    so the kernel log is neither cleared nor re-read as a whole.
+    Records are matched against all error patterns in one pass.
+    """
+
+    def __init__(self, patterns, max_level=7):
+        super(KmsgMonitor, self).__init__()
+        self.daemon = True
+        self.matcher = re.compile("|".join(re.escape(pattern)
+                                           for pattern in patterns))
+        self.max_level = max_level
+        self.records = []
+        self.errors = []
+        self._cursor = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._fd = os.open('/dev/kmsg', os.O_RDONLY | os.O_NONBLOCK)
+        # skip the records logged before the test started
+        os.lseek(self._fd, 0, os.SEEK_END)
+
+    def _read_records(self):
+        with self._lock:
+            while True:
+                try:
+                    data = os.read(self._fd, 8192)
+                except BlockingIOError:
+                    return
+                except BrokenPipeError:
+                    # the record at the cursor got overwritten, go on
+                    continue
+                text = data.decode('utf-8', 'replace')
+                header, _, text = text.partition(';')
+                prio = header.split(',')[0]
+                message = text.split('\n')[0]
+                self.records.append(message)
+                if (int(prio) & 7 <= self.max_level and
+                        self.matcher.search(message)):
+                    self.errors.append(message)
+
+    def run(self):
+        while not self._stopped.is_set():
+            select.select([self._fd], [], [], 0.5)
+            self._read_records()
+
+    def new_errors(self):
+        """
+        Returns the error records logged since the previous call
+        """
+        self._read_records()
+        with self._lock:
+            errors = self.errors[self._cursor:]
+            self._cursor = len(self.errors)
+        return errors
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        os.close(self._fd)
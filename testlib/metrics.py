@@ -0,0 +1,113 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See LICENSE for more details.
+#
+# Copyright: 2020 IBM
+
+"""
+Typed benchmark metrics and their SQLite results history
+"""
+
+import os
+import json
+import time
+import sqlite3
+import platform
+
+
+_METRICS_SCHEMA = ('CREATE TABLE IF NOT EXISTS metrics (stamp REAL, '
+                   'host TEXT, kernel TEXT, test TEXT, variant TEXT, '
+                   'metric TEXT, '
+                   'value REAL, unit TEXT, higher_is_better INTEGER)')
+_METRICS_INDEX = ('CREATE INDEX IF NOT EXISTS metrics_idx ON metrics '
+                  '(host, kernel, test, variant)')
+
+
+def metric(name, value, unit, higher_is_better=True):
+    """
+    Returns a typed benchmark metric.
+    """
+    return {'name': name, 'value': float(value), 'unit': unit,
+            'higher_is_better': bool(higher_is_better)}
+
+
+def record_metrics(db_path, test, variant, metrics):
+    """
+    Stores metrics in the SQLite results history at db_path, indexed by
+    host, kernel, test and variant.
+    """
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.isdir(db_dir):
+        os.makedirs(db_dir)
+    stamp = time.time()
+    conn = sqlite3.connect(db_path, timeout=60)
+    with conn:
+        conn.execute(_METRICS_SCHEMA)
+        conn.execute(_METRICS_INDEX)
+        conn.executemany('INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?, '
+                         '?, ?)',
+                         [(stamp, platform.node(), platform.release(), test,
+                           variant, item['name'], item['value'], item['unit'],
+                           int(item['higher_is_better'])) for item in metrics])
+    conn.close()
+
+
+def compare_metrics(db_path, test, variant, kernel=None, threshold=5):
+    """
+    Compares the latest results of a test variant on this host for kernel
+    (the running one by default) to the latest results of every other kernel.
+
+    :return: list of (metric, other kernel, other value, value, unit,
+             change %) tuples where kernel is worse by more than threshold%.
+    """
+    kernel = kernel or platform.release()
+    conn = sqlite3.connect(db_path, timeout=60)
+    with conn:
+        conn.execute(_METRICS_SCHEMA)
+        rows = conn.execute('SELECT kernel, metric, value, unit, '
+                            'higher_is_better FROM metrics WHERE host = ? AND '
+                            'test = ? AND variant = ? ORDER BY stamp',
+                            (platform.node(), test, variant)).fetchall()
+    conn.close()
+    latest = {}
+    for row in rows:
+        latest[(row[0], row[1])] = row
+    regressions = []
+    for (other, name), (_, _, value, unit, higher) in sorted(latest.items()):
+        current = latest.get((kernel, name))
+        if other == kernel or current is None or not value:
+            continue
+        change = (current[2] - value) * 100.0 / value
+        if (-change if higher else change) > threshold:
+            regressions.append((name, other, value, current[2], unit, change))
+    return regressions
+
+
+def emit_metrics(test, name, variant, metrics):
+    """
+    Records metrics in the whiteboard of test and in the results history
+    (metrics_db parameter) and warns about regressions against the other
+    kernels tested on this host.
+    """
+    db_path = test.params.get('metrics_db', default=os.path.join(
+        test.cache_dirs[0], 'metrics.sqlite'))
+    threshold = float(test.params.get('metrics_threshold', default=5))
+    test.whiteboard = json.dumps(dict(
+        (item['name'], {'value': item['value'], 'unit': item['unit'],
+                        'higher_is_better': item['higher_is_better']})
+        for item in metrics), indent=1)
+    record_metrics(db_path, name, variant, metrics)
+    regressions = compare_metrics(db_path, name, variant,
+                                  threshold=threshold)
+    for regression in regressions:
+        test.log.warning("REGRESSION: %s %s was %s %s on %s (%+.2f%%)",
+                         regression[0], regression[3], regression[2],
+                         regression[4], regression[1], regression[5])
+    return regressions
@@ -0,0 +1,86 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See LICENSE for more details.
+#
+# Copyright: 2020 IBM
+
+"""
+Batched installation of test dependencies
+"""
+
+import os
+import json
+import tempfile
+from avocado.utils import distro, process
+
+
+def query_installed(packages):
+    """
+    Returns the set of packages which are installed, queried with one
+    call of the package database
+    """
+    if distro.detect().name in ['Ubuntu', 'debian']:
+        cmd = "dpkg-query -W -f='${Package} ${Status}\\n' %s" % " ".join(
+            packages)
+        output = process.system_output(cmd, ignore_status=True, shell=True,
+                                       verbose=False).decode()
+        return set(line.split()[0].split(':')[0]
+                   for line in output.splitlines()
+                   if line.endswith('install ok installed'))
+    # rpm reports missing packages on stdout as well ("package foo is
+    # not installed"), so only lines naming a package count
+    cmd = "rpm -q --qf '%%{NAME}\\n' %s" % " ".join(packages)
+    output = process.system_output(cmd, ignore_status=True, shell=True,
+                                   verbose=False).decode()
+    return set(line.strip() for line in output.splitlines()
+               if line.strip() in packages)
+
+
+def install_packages(smm, packages, memo_file):
+    """
+    Installs the missing packages in one transaction. The installed state
+    is queried once for the whole list and memoized in memo_file, so later
+    tests of the job skip the package database queries.
+
+    :return: list of packages which could not be installed
+    """
+    installed = set()
+    if os.path.isfile(memo_file):
+        with open(memo_file) as memo:
+            try:
+                installed.update(json.load(memo))
+            except ValueError:
+                pass
+    todo = [pkg for pkg in packages if pkg and pkg not in installed]
+    if not todo:
+        return []
+    found = query_installed(todo)
+    missing = [pkg for pkg in todo if pkg not in found]
+    if missing:
+        # the package manager may succeed while some of the names do
+        # not exist, so the database has the last word
+        smm.install(" ".join(missing))
+        found.update(query_installed(missing))
+        missing = [pkg for pkg in missing if pkg not in found]
+    if missing:
+        # install the rest one by one, past the package which broke the
+        # transaction
+        for pkg in missing:
+            smm.install(pkg)
+        found.update(query_installed(missing))
+        missing = [pkg for pkg in missing if pkg not in found]
+    installed.update(found)
+    # tests of the job may read the memo concurrently, replace it whole
+    memo_dir = os.path.dirname(memo_file)
+    fd, tmp_file = tempfile.mkstemp(dir=memo_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w') as memo:
+        json.dump(sorted(installed), memo)
+    os.rename(tmp_file, memo_file)
+    return missing
@@ -0,0 +1,201 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See LICENSE for more details.
+#
+# Copyright: 2020 IBM
+
+"""
+Connection to the peer of the network tests
+"""
+
+import os
+import shlex
+import hashlib
+import shutil
+import tempfile
+from avocado.utils import process
+
+
+class PeerConnection(object):
+
+    """
+    ssh connection to a peer where every command and file copy goes over
+    one master connection (ssh ControlMaster), so only the first one pays
+    for the handshake and authentication. The master socket lives in a
+    private directory, so connections of concurrent tests to the same peer
+    never share (and tear down) each other's master.
+    """
+
+    def __init__(self, host, user, password=None, persist=600):
+        self.host = host
+        self.user = user
+        self.password = password
+        # short path, unix sockets are limited to 108 bytes
+        self.control_dir = tempfile.mkdtemp(prefix='avocado-ssh-')
+        self.control_path = os.path.join(self.control_dir, 'master')
+        self.options = ('-o StrictHostKeyChecking=no '
+                        '-o UserKnownHostsFile=/dev/null -o LogLevel=ERROR '
+                        '-o ControlMaster=auto -o ControlPath=%s '
+                        '-o ControlPersist=%s' % (self.control_path, persist))
+        self.connected = False
+
+    def _run(self, cmd, timeout=None):
+        env = None
+        if self.password:
+            # the password goes through the environment, not the command
+            cmd = "sshpass -e %s" % cmd
+            env = {'SSHPASS': self.password}
+        return process.run(cmd, shell=True, ignore_status=True,
+                           timeout=timeout, env=env)
+
+    def _ssh(self, command):
+        return "ssh %s %s@%s %s" % (self.options, self.user, self.host,
+                                    shlex.quote(command))
+
+    def connect(self):
+        """
+        Starts the master connection unless one is already up. Later
+        commands start a new one (ControlMaster=auto) if it went away.
+        """
+        if not self.connected:
+            check = "ssh %s -O check %s@%s" % (self.options, self.user,
+                                               self.host)
+            self.connected = (
+                process.system(check, shell=True, ignore_status=True,
+                               verbose=False) == 0 or
+                self._run("ssh %s -f -N %s@%s" % (
+                    self.options, self.user, self.host)).exit_status == 0)
+        return self.connected
+
+    def get_raw_ssh_command(self, command):
+        """
+        Returns an ssh command line running command over the master
+        connection.
+        """
+        self.connect()
+        return self._ssh(command)
+
+    def cmd(self, command, timeout=None):
+        """
+        Runs command on the peer and returns its result.
+        """
+        self.connect()
+        return self._run(self._ssh(command), timeout=timeout)
+
+    def run_batch(self, commands, timeout=None):
+        """
+        Runs commands one after the other in a single remote shell.
+
+        :return: list of the exit status of every command, None for the
+                 ones which did not run
+        """
+        marker = '__avocado_rc__'
+        script = "; ".join("(%s) >/dev/null 2>&1; echo %s$?" % (cmd, marker)
+                           for cmd in commands)
+        output = self.cmd(script, timeout=timeout).stdout.decode("utf-8")
+        status = [int(line[len(marker):]) for line in output.splitlines()
+                  if line.startswith(marker)]
+        return status + [None] * (len(commands) - len(status))
+
+    def copy_files(self, source, destination, recursive=False):
+        """
+        Copies source to destination on the peer over the master
+        connection.
+
+        :return: True on success
+        """
+        self.connect()
+        cmd = "scp %s %s %s %s@%s:%s" % (self.options,
+                                         '-r' if recursive else '', source,
+                                         self.user, self.host, destination)
+        return self._run(cmd).exit_status == 0
+
+    def quit(self):
+        """
+        Stops the master connection.
+        """
+        process.system("ssh %s -O exit %s@%s" % (self.options, self.user,
+                                                 self.host),
+                       shell=True, ignore_status=True, verbose=False)
+        self.connected = False
+        shutil.rmtree(self.control_dir, ignore_errors=True)
+
+
+def peer_build_key(tarball, *inputs):
+    """
+    Returns the key of a peer build of tarball, given the other inputs
+    of the build (peer arch, compiler, build commands).
+    """
+    digest = hashlib.sha256()
+    with open(tarball, 'rb') as tar_file:
+        for block in iter(lambda: tar_file.read(1 << 20), b''):
+            digest.update(block)
+    for item in inputs:
+        digest.update(str(item).encode())
+    return digest.hexdigest()
+
+
+def peer_build(session, src_dir, build_cmd, binary, cache_dir, key,
+               policy='reuse'):
+    """
+    Builds src_dir on the peer in cache_dir/<key>, unless a build with the
+    same key is already there and policy is 'reuse'.
+
+    The build runs in a temporary sibling directory and is renamed into
+    place once complete, so tests sharing the peer never see, or delete,
+    a tree that is half copied or half built.
+
+    :param binary: path of the built binary, relative to src_dir
+    :return: tuple of the build directory on the peer and 'reused' or
+             'built'. When the build fails the directory is None and the
+             second item names the failed step, 'copy' or 'build'.
+    """
+    parent = "%s/%s" % (cache_dir, key[:16])
+    peer_dir = "%s/%s" % (parent, os.path.basename(src_dir))
+    marker = "%s/.avocado-build-key"
+    check = "test -x %s/%s && cat %s" % (peer_dir, binary, marker % peer_dir)
+
+    def is_built():
+        output = session.cmd(check)
+        return (output.exit_status == 0 and
+                output.stdout.decode("utf-8").strip() == key)
+
+    if policy == 'reuse' and is_built():
+        return peer_dir, 'reused'
+    output = session.cmd("mkdir -p %s && mktemp -d %s/.build.XXXXXX" %
+                         (parent, parent))
+    if output.exit_status != 0:
+        return None, 'copy'
+    tmp_dir = output.stdout.decode("utf-8").strip()
+    build_dir = "%s/%s" % (tmp_dir, os.path.basename(src_dir))
+    if not session.copy_files(src_dir, tmp_dir, recursive=True):
+        session.cmd("rm -rf %s" % tmp_dir)
+        return None, 'copy'
+    cmd = "cd %s && (%s) && echo %s > %s" % (build_dir, build_cmd, key,
+                                             marker % build_dir)
+    if session.cmd(cmd).exit_status != 0:
+        session.cmd("rm -rf %s" % tmp_dir)
+        return None, 'build'
+    # rename(2) only replaces an empty directory: when another test
+    # published first, keep its build unless asked to rebuild, otherwise
+    # move the old tree aside before putting the new one in its place
+    if session.cmd("mv -T %s %s" % (build_dir, peer_dir)).exit_status == 0:
+        session.cmd("rm -rf %s" % tmp_dir)
+        return peer_dir, 'built'
+    if policy == 'reuse' and is_built():
+        session.cmd("rm -rf %s" % tmp_dir)
+        return peer_dir, 'reused'
+    cmd = "mv -T %s %s/old && mv -T %s %s" % (peer_dir, tmp_dir, build_dir,
+                                              peer_dir)
+    status = session.cmd(cmd).exit_status
+    session.cmd("rm -rf %s" % tmp_dir)
+    if status != 0:
+        return None, 'build'
+    return peer_dir, 'built'
@@ -0,0 +1,172 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See LICENSE for more details.
+#
+# Copyright: 2020 IBM
+
+"""
+Multiplexed "perf stat" event counting
+"""
+
+from avocado.utils import process
+
+
+def parse_perf_csv(output, events, interval=True):
+    """
+    Parses "perf stat -x," output of the given events, counted with
+    -I <msecs> unless interval is False. Lines are matched by event name,
+    so perf warnings and other lines in between are ignored.
+
+    :return: dict of (event, location) to the list of (count, running %)
+             per interval, location being the cpu/core/socket column(s)
+    """
+    samples = {}
+    for line in output.splitlines():
+        for event in events:
+            pos = line.find(",%s," % event)
+            if pos < 0:
+                continue
+            head = line[:pos].split(',')
+            tail = line[pos + len(event) + 2:].split(',')
+            # head is: [time,] [location,] count, unit
+            location = ",".join(head[1 if interval else 0:-2])
+            try:
+                running = float(tail[1])
+            except (IndexError, ValueError):
+                running = 0.0
+            samples.setdefault((event, location), []).append(
+                (head[-2], running))
+            break
+    return samples
+
+
+def run_batch(events, perf_flags, interval=None, group_size=0):
+    """
+    Counts the events with one multiplexed "perf stat -x," run, every
+    interval msecs if given. Failed runs are bisected down to the failing
+    events.
+
+    :param group_size: events per {} group, 0 to let perf multiplex them
+    :return: tuple of the samples, as returned by parse_perf_csv, and the
+             list of events which could not be counted
+    """
+    if group_size:
+        groups = ["{%s}" % ",".join(events[i:i + group_size])
+                  for i in range(0, len(events), group_size)]
+    else:
+        groups = events
+    cmd = "perf stat -x, %s %s -e %s sleep 1" % (
+        "-I %s" % interval if interval else "", perf_flags, ",".join(groups))
+    result = process.run(cmd, ignore_status=True, verbose=False)
+    samples = parse_perf_csv(result.stderr.decode("utf-8"), events,
+                             bool(interval))
+    if (result.exit_status == 0 and
+            len(set(event for event, _ in samples)) == len(events)):
+        return samples, []
+    if len(events) == 1:
+        return {}, list(events)
+    half = len(events) // 2
+    samples, failed = run_batch(events[:half], perf_flags, interval,
+                                group_size)
+    more_samples, more_failed = run_batch(events[half:], perf_flags,
+                                          interval, group_size)
+    samples.update(more_samples)
+    return samples, failed + more_failed
+
+
+def counter_status(values):
+    """
+    Returns the status of a counter from its (count, running %) values:
+    'ok', 'zero', 'not monotonic' or the perf marker, such as
+    '<not supported>', of an interval it was not counted in
+    """
+    cumulative = [0]
+    for count, _ in values:
+        try:
+            count = float(count)
+        except ValueError:
+            return count
+        # -I prints the increment of each interval, rebuild the counter
+        cumulative.append(cumulative[-1] + count)
+    for previous, current in zip(cumulative, cumulative[1:]):
+        # a counter which went backwards or wrapped around
+        if current < previous or current - previous >= 2 ** 63:
+            return 'not monotonic'
+    if not cumulative[-1]:
+        return 'zero'
+    return 'ok'
+
+
+def write_counters(samples, filename):
+    """
+    Writes the count table of samples keyed by (event, mode, location)
+    to filename
+
+    :return: list of (event, mode, location, status) of the counters
+             whose status is not 'ok'
+    """
+    bad = []
+    with open(filename, 'w') as table:
+        table.write("event,mode,location,count,min_running_pct,status\n")
+        for key, values in sorted(samples.items()):
+            status = counter_status(values)
+            total = 0.0
+            for count, _ in values:
+                try:
+                    total += float(count)
+                except ValueError:
+                    # <not supported> or <not counted>
+                    continue
+            running = min(pct for _, pct in values)
+            table.write('"%s",%s,"%s",%d,%.2f,%s\n'
+                        % (key + (total, running, status)))
+            if status != 'ok':
+                bad.append(key + (status,))
+    return bad
+
+
+def count_modes(events, modes, batch_size, interval):
+    """
+    Counts the events in batches of batch_size events, once for every
+    (mode, perf_flags) of modes
+
+    :return: tuple of the samples keyed by (event, mode, location) and
+             the list of "perf stat" commands of the events which could
+             not be counted
+    """
+    samples = {}
+    failed_cmds = []
+    for mode, perf_flags in modes:
+        for index in range(0, len(events), batch_size):
+            batch, failed = run_batch(events[index:index + batch_size],
+                                      perf_flags, interval)
+            for (event, location), values in batch.items():
+                samples[(event, mode, location)] = values
+            failed_cmds.extend("perf stat %s -e %s sleep 1"
+                               % (perf_flags, event) for event in failed)
+    return samples, failed_cmds
+
+
+def check_counters(samples, filename, require_nonzero, log):
+    """
+    Writes the count table of samples to filename and checks the counters
+    counted something and never went backwards (wrapped) between
+    intervals. Counters which counted nothing are only logged unless
+    require_nonzero.
+
+    :return: list of the descriptions of the bad counters
+    """
+    bad = []
+    for event, mode, location, status in write_counters(samples, filename):
+        if status == 'zero' and not require_nonzero:
+            log.warning("%s counted nothing on %s", event, location)
+        else:
+            bad.append("%s %s on %s: %s" % (event, mode, location, status))
+    return bad
@@ -0,0 +1,124 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See LICENSE for more details.
+#
+# Copyright: 2020 IBM
+
+"""
+Platform facts, probed on first use and cached for the whole process
+"""
+
+import os
+import re
+from functools import lru_cache, wraps
+
+from avocado.core import exceptions
+from avocado.utils import genio
+from avocado.utils import process
+
+
+@lru_cache(maxsize=None)
+def cpuinfo():
+    """
+    Returns the contents of /proc/cpuinfo
+    """
+    return genio.read_file('/proc/cpuinfo')
+
+
+@lru_cache(maxsize=None)
+def meminfo():
+    """
+    Returns /proc/meminfo as a dict of field name to value
+    """
+    fields = {}
+    for line in genio.read_file('/proc/meminfo').splitlines():
+        name, _, value = line.partition(':')
+        fields[name] = value.strip()
+    return fields
+
+
+def is_power_vm():
+    return 'pSeries' in cpuinfo()
+
+
+def is_power_nv():
+    return 'PowerNV' in cpuinfo()
+
+
+def is_kvm_guest():
+    return 'qemu' in cpuinfo()
+
+
+def is_nv_or_kvm_guest():
+    return is_power_nv() or is_kvm_guest()
+
+
+def is_ppc():
+    return 'ppc' in os.uname()[4]
+
+
+@lru_cache(maxsize=None)
+def cpu_generation():
+    """
+    Returns the processor generation, e.g. POWER9, or None if cpuinfo
+    does not name one
+    """
+    match = re.search(r'^cpu\s*:\s*(POWER\d+)', cpuinfo(), re.M)
+    if match:
+        return match.group(1)
+    return None
+
+
+@lru_cache(maxsize=None)
+def page_size():
+    return os.sysconf('SC_PAGE_SIZE')
+
+
+def is_4k_pagesize():
+    return page_size() == 4096
+
+
+def has_hugepagesize():
+    return 'Hugepagesize' in meminfo()
+
+
+@lru_cache(maxsize=None)
+def active_interface():
+    """
+    Returns the first active interface that is neither loopback nor virtual
+    """
+    return process.system_output(
+        "ip link ls up  | awk -F: '$0 !~ \"lo|vir|^[^0-9]\"{print $2}'"
+        " | cut -d  \" \" -f2 | head -1",
+        shell=True).decode("utf-8").strip().split()[0]
+
+
+def skip_if(probe, message=None):
+    """
+    Skips the decorated setUp or test method when probe() is true.
+
+    Unlike avocado's skipIf, the probe runs when the method is called,
+    not when the module is imported, so listing tests probes nothing.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if probe():
+                raise exceptions.TestDecoratorSkip(message)
+            return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def skip_unless(probe, message=None):
+    """
+    Skips the decorated setUp or test method unless probe() is true.
+    """
+    return skip_if(lambda: not probe(), message)
@@ -0,0 +1,110 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See LICENSE for more details.
+#
+# Copyright: 2020 IBM
+
+"""
+Repetition of benchmark measurements until they are trustworthy
+"""
+
+import math
+import time
+
+
+# two-sided 95% Student t quantiles for 1 to 30 degrees of freedom
+_T_95 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262,
+         2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101,
+         2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052,
+         2.048, 2.045, 2.042)
+
+
+class RepetitionController(object):
+
+    """
+    Repeats a measurement until its result is trustworthy.
+
+    After warmup discarded runs, the measurement is repeated at least
+    min_runs times and then until the 95% confidence interval half-width
+    is within ci_target percent of the mean, max_runs is reached or the
+    next run would exceed time_budget seconds. By default the measurement
+    is taken once.
+    """
+
+    def __init__(self, log, warmup=0, min_runs=1, max_runs=1, ci_target=5,
+                 time_budget=None):
+        self.log = log
+        self.warmup = int(warmup)
+        self.max_runs = max(int(max_runs), 1)
+        self.min_runs = min(max(int(min_runs), 1), self.max_runs)
+        self.ci_target = float(ci_target)
+        self.time_budget = float(time_budget) if time_budget else None
+        self.samples = []
+
+    @staticmethod
+    def summary(samples):
+        """
+        Returns mean, median, stddev, 95% CI half-width (absolute and
+        relative to the mean, in %) and the MAD based outliers of samples.
+        """
+        count = len(samples)
+        ordered = sorted(samples)
+        mean = sum(samples) / count
+        median = (ordered[(count - 1) // 2] + ordered[count // 2]) / 2.0
+        stddev = 0.0
+        half_width = 0.0
+        if count > 1:
+            stddev = math.sqrt(sum((sample - mean) ** 2 for sample in samples)
+                               / (count - 1))
+            t_value = _T_95[min(count - 1, len(_T_95)) - 1]
+            half_width = t_value * stddev / math.sqrt(count)
+        deviations = sorted(abs(sample - median) for sample in samples)
+        mad = (deviations[(count - 1) // 2] + deviations[count // 2]) / 2.0
+        outliers = [sample for sample in samples
+                    if mad and 0.6745 * abs(sample - median) / mad > 3.5]
+        return {'runs': count, 'mean': mean, 'median': median,
+                'stddev': stddev, 'ci': half_width,
+                'ci_pct': half_width * 100.0 / mean if mean else 0.0,
+                'outliers': outliers}
+
+    def run(self, measure):
+        """
+        Calls measure(), which returns one sample, as configured.
+
+        :return: the summary of the measured samples
+        """
+        for run in range(self.warmup):
+            self.log.info("Warmup run %s", run + 1)
+            measure()
+        start = time.time()
+        self.samples = []
+        longest = 0.0
+        while len(self.samples) < self.max_runs:
+            run_start = time.time()
+            self.log.info("Run %s", len(self.samples) + 1)
+            self.samples.append(float(measure()))
+            longest = max(longest, time.time() - run_start)
+            if len(self.samples) < self.min_runs:
+                continue
+            stats = self.summary(self.samples)
+            if stats['runs'] > 1 and stats['ci_pct'] <= self.ci_target:
+                break
+            if (self.time_budget and
+                    time.time() - start + longest > self.time_budget):
+                self.log.info("Time budget of %ss exhausted",
+                              self.time_budget)
+                break
+        stats = self.summary(self.samples)
+        self.log.info("%s runs: mean %.4f, median %.4f, stddev %.4f, "
+                      "95%% CI +/- %.4f (%.2f%%), outliers %s",
+                      stats['runs'], stats['mean'], stats['median'],
+                      stats['stddev'], stats['ci'], stats['ci_pct'],
+                      stats['outliers'])
+        return stats
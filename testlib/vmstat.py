@@ -0,0 +1,122 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See LICENSE for more details.
+#
+# Copyright: 2020 IBM
+
+"""
+Background sampling of the kernel memory counters
+"""
+
+import os
+import json
+import time
+import array
+import threading
+
+
+class VmSampler(threading.Thread):
+
+    """
+    Samples /proc/vmstat and /proc/meminfo counters every interval seconds
+    in the background. Both files are opened once and re-read with pread,
+    and the samples are kept in one array per counter.
+    """
+
+    def __init__(self, vmstat_keys, meminfo_keys, interval=0.1):
+        super(VmSampler, self).__init__()
+        self.daemon = True
+        self.keys = list(vmstat_keys) + list(meminfo_keys)
+        self.interval = interval
+        self.times = array.array('d')
+        self.values = dict((key, array.array('q')) for key in self.keys)
+        self._stopped = threading.Event()
+        self._fds = [os.open('/proc/vmstat', os.O_RDONLY),
+                     os.open('/proc/meminfo', os.O_RDONLY)]
+        self.start_time = time.time()
+        self.sample()
+
+    def sample(self):
+        counters = {}
+        for fd in self._fds:
+            for line in os.pread(fd, 1 << 16, 0).decode().splitlines():
+                fields = line.split()
+                if len(fields) >= 2:
+                    counters[fields[0].rstrip(':')] = fields[1]
+        self.times.append(time.time() - self.start_time)
+        for key in self.keys:
+            self.values[key].append(int(counters.get(key, 0)))
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        if self._fds:
+            self._stopped.set()
+            self.join()
+            self.sample()
+            for fd in self._fds:
+                os.close(fd)
+            self._fds = []
+
+    def first_change(self, key, since=0.0):
+        """
+        Returns the seconds after since (relative to the sampler start)
+        until key first changed, None if it did not.
+        """
+        values = self.values[key]
+        base = None
+        for when, value in zip(self.times, values):
+            if when < since:
+                continue
+            if base is None:
+                base = value
+            elif value != base:
+                return when - since
+        return None
+
+    def summary(self):
+        """
+        Returns the first and last value, the delta, the peak rate per
+        second and the time to the first change of every counter.
+        """
+        summary = {}
+        for key in self.keys:
+            values = self.values[key]
+            peak = 0.0
+            for idx in range(1, len(values)):
+                elapsed = self.times[idx] - self.times[idx - 1]
+                if elapsed > 0:
+                    peak = max(peak, abs(values[idx] - values[idx - 1]) /
+                               elapsed)
+            summary[key] = {'first': values[0], 'last': values[-1],
+                            'delta': values[-1] - values[0],
+                            'peak_rate': peak,
+                            'first_change_secs': self.first_change(key)}
+        return summary
+
+    def save(self, outputdir):
+        """
+        Writes the samples to vmstat_samples.csv and their summary to
+        vmstat_summary.json in outputdir, and returns the summary.
+        """
+        with open(os.path.join(outputdir,
+                               'vmstat_samples.csv'), 'w') as csv_file:
+            csv_file.write(",".join(['time'] + self.keys) + "\n")
+            for idx, when in enumerate(self.times):
+                csv_file.write(",".join(
+                    ["%.3f" % when] +
+                    [str(self.values[key][idx]) for key in self.keys]) + "\n")
+        summary = self.summary()
+        with open(os.path.join(outputdir,
+                               'vmstat_summary.json'), 'w') as s_file:
+            json.dump(summary, s_file, indent=1)
+        return summary